@@ -1,8 +1,25 @@
 const BASE_URL: string = import.meta.env.VITE_APP_API_URL;
-const API_URL = `${BASE_URL}/api/log`;
+const API_URL = `${BASE_URL}/api/logs`;
 
 console.log("Base URL:", BASE_URL);
 
+/*
+ * Logs are buffered here and POSTed to /api/logs in batches rather than one
+ * request per call. The contract with the server:
+ *  - a batch is a JSON array of {level, message, metadata, timestamp} records,
+ *    at most MAX_BATCH records (the server's FRONTEND_LOG_MAX_BATCH, 500 by default);
+ *  - it is sent once MAX_BATCH records are waiting, FLUSH_INTERVAL_MS after
+ *    the first one was queued, or when the page is hidden, whichever is first;
+ *  - bodies are gzipped (Content-Encoding: gzip) when the browser has CompressionStream;
+ *  - the server answers 202 {accepted, rejected: [{index, error}]}; rejected
+ *    records are malformed and are not resent. Network errors and 5xx responses
+ *    put the batch back in the buffer, which keeps at most MAX_BUFFERED records
+ *    (the oldest are dropped). Resent records keep their timestamp, so the
+ *    server's dedup drops any that had already been written.
+ */
+const MAX_BATCH = 100;
+const MAX_BUFFERED = 1000;
+const FLUSH_INTERVAL_MS = 2000;
 
 // Define log levels
 type LogLevel = 'log' | 'info' | 'warn' | 'error' | 'debug';
@@ -12,13 +29,96 @@ interface LogMetadata {
   [key: string]: unknown;
 }
 
+interface LogRecord {
+  level: LogLevel;
+  message: string;
+  metadata: LogMetadata;
+  timestamp: string;
+}
+
+let buffer: LogRecord[] = [];
+let flushTimer: ReturnType<typeof setTimeout> | null = null;
+
+const gzip = async (body: string): Promise<Blob | null> => {
+  if (typeof CompressionStream === 'undefined') {
+    return null;
+  }
+  const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+  return new Response(stream).blob();
+};
+
+const requeue = (records: LogRecord[]) => {
+  buffer = records.concat(buffer).slice(-MAX_BUFFERED);
+  scheduleFlush();
+};
+
+// keepalive lets a request outlive the page, but browsers cap all in-flight keepalive
+// bodies at 64 KiB together, so it is only used for the last records on pagehide
+const sendBatch = async (records: LogRecord[], keepalive = false): Promise<void> => {
+  const body = JSON.stringify(records);
+  const compressed = await gzip(body);
+  try {
+    const response = await fetch(API_URL, {
+      method: 'POST',
+      headers: compressed
+        ? { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' }
+        : { 'Content-Type': 'application/json' },
+      body: compressed ?? body,
+      keepalive,
+    });
+    if (response.status >= 500) {
+      requeue(records);
+    } else if (!response.ok) {
+      console.error('Server refused logs:', response.status, await response.text());
+    }
+  } catch (err) {
+    console.error('Failed to send logs to server:', err);
+    requeue(records);
+  }
+};
+
+export const flushLogs = async (): Promise<void> => {
+  if (flushTimer !== null) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  const sends: Promise<void>[] = [];
+  while (buffer.length > 0) {
+    sends.push(sendBatch(buffer.splice(0, MAX_BATCH)));
+  }
+  await Promise.all(sends);
+};
+
+function scheduleFlush() {
+  if (flushTimer === null && buffer.length > 0) {
+    flushTimer = setTimeout(() => {
+      flushTimer = null;
+      void flushLogs();
+    }, FLUSH_INTERVAL_MS);
+  }
+}
+
+// A closing tab cannot wait for gzip or a response; sendBeacon delivers the rest uncompressed
+// (as text/plain, which needs no CORS preflight; the server ignores the Content-Type)
+if (typeof window !== 'undefined') {
+  window.addEventListener('pagehide', () => {
+    while (buffer.length > 0) {
+      const records = buffer.splice(0, MAX_BATCH);
+      const blob = new Blob([JSON.stringify(records)], { type: 'text/plain' });
+      if (!navigator.sendBeacon?.(API_URL, blob)) {
+        void sendBatch(records, true);
+      }
+    }
+  });
+}
+
 // Define the logging function
 export const logFrontend = async (
   level: LogLevel,
   message: string,
   metadata: LogMetadata = {}
 ): Promise<void> => {
-  const payload = {
+  const payload: LogRecord = {
     level,
     message,
     metadata,
@@ -30,14 +130,14 @@ export const logFrontend = async (
     console[level](`[${level.toUpperCase()}]: ${message}`, metadata);
   }
 
-  // Send to backend
-  try {
-    await fetch(API_URL, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(payload),
-    });
-  } catch (err) {
-    console.error('Failed to send log to server:', err);
+  // Queue for the backend
+  buffer.push(payload);
+  if (buffer.length > MAX_BUFFERED) {
+    buffer.shift();
+  }
+  if (buffer.length >= MAX_BATCH) {
+    await flushLogs();
+  } else {
+    scheduleFlush();
   }
 };
@@ -1,8 +1,44 @@
 import requests
 import os
+import mimetypes
+import time
 from dotenv import load_dotenv
+from metrics import histogram
 load_dotenv() 
-def analyze_audio_with_deepgram(audio_url):
+# Point this at a local stub (see stubs/deepgram_stub.py) to run without the real API
+DEEPGRAM_API_URL = os.getenv("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+DEEPGRAM_TIMEOUT = float(os.getenv("DEEPGRAM_TIMEOUT", "300"))
+
+# Requests in flight at once (see deepgram_dispatch.py); also sizes the connection pool
+DEEPGRAM_CONCURRENCY = int(os.getenv("DEEPGRAM_CONCURRENCY", "8"))
+
+# One session for every call so the TLS connection to Deepgram is kept alive
+session = requests.Session()
+session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=DEEPGRAM_CONCURRENCY))
+session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=DEEPGRAM_CONCURRENCY))
+
+
+REQUEST_SECONDS = histogram("deepgram_request_seconds", "Deepgram API calls by request type and HTTP status",
+                            ("mode", "status"))
+
+
+class DeepgramError(Exception):
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after   # seconds, from the Retry-After header
+
+def analyze_audio_with_deepgram(audio_url=None, file_path=None, timeout=None):
+    """Transcribe either a URL Deepgram can fetch (e.g. an Azure SAS URL) or a local file.
+
+    Local files are streamed in the request body, so no public tunnel is needed.
+    When both are given the URL wins and nothing is uploaded.
+    Raises DeepgramError carrying the HTTP status when Deepgram rejects the call.
+    """
+    if not audio_url and not file_path:
+        raise ValueError("Either audio_url or file_path is required")
+    timeout = timeout or DEEPGRAM_TIMEOUT
+
     DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
     headers = {
         "Authorization": f"Token {DEEPGRAM_API_KEY}",
@@ -12,7 +48,7 @@ def analyze_audio_with_deepgram(audio_url):
     params = {
         "punctuate": "true",
         "language": "en",
-        "model": "nova-3",
+        "model": os.getenv("DEEPGRAM_MODEL", "nova-3"),
         "summarize": "v2",
         "topics": "true",
         "sentiment": "true",
@@ -22,15 +58,28 @@ def analyze_audio_with_deepgram(audio_url):
         "smart_format": "true"
     }
 
-    payload = {
-        "url": audio_url
-    }
+    started = time.perf_counter()
+    if audio_url:
+        payload = {
+            "url": audio_url
+        }
 
-    print(f"🔍 Sending this AUDIO_URL to Deepgram: {audio_url}")
-    print("📦 Payload:", payload)
+        # A SAS URL's query string is its signature; keep it out of the output
+        shown_url = audio_url.split("?", 1)[0]
+        print(f"🔍 Sending this AUDIO_URL to Deepgram: {shown_url}")
+        print("📦 Payload:", dict(payload, url=shown_url))
 
-    response = requests.post("https://api.deepgram.com/v1/listen", headers=headers, params=params, json=payload)
+        response = session.post(DEEPGRAM_API_URL, headers=headers, params=params, json=payload,
+                                timeout=timeout)
+    else:
+        headers["Content-Type"] = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        print(f"🔍 Uploading this file to Deepgram: {file_path}")
+        with open(file_path, "rb") as audio_file:
+            response = session.post(DEEPGRAM_API_URL, headers=headers, params=params, data=audio_file,
+                                    timeout=timeout)
 
+    REQUEST_SECONDS.observe(time.perf_counter() - started, mode="url" if audio_url else "upload",
+                            status=response.status_code)
     if response.ok:
         response_json = response.json()
         results = {
@@ -39,4 +88,6 @@ def analyze_audio_with_deepgram(audio_url):
         print("REsults",results)
         return results
     else:
-        raise Exception(f"Deepgram API error: {response.text}")
+        retry_after = response.headers.get("Retry-After")
+        raise DeepgramError(f"Deepgram API error: {response.text}", status_code=response.status_code,
+                            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
@@ -1,33 +1,52 @@
-from flask import Flask, jsonify, send_from_directory, request, Response
+from flask import Flask, jsonify, send_from_directory, request, Response, g
 from flask_cors import CORS
-import os, hashlib, datetime, pyodbc
-from azure.storage.blob import BlobServiceClient
+import os, hashlib, datetime, mimetypes, json, queue, threading, tempfile
+from functools import partial
+from contextlib import closing
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-from DeepTranscript import analyze_audio_with_deepgram #deepgram
-from audio import process_audio_file  # whisper
-# from aws_audio import process_audio_with_aws
-# from azure_audio import process_audio_with_azure
-from logger import process_logs
+from werkzeug.exceptions import HTTPException
+# Model backends (whisper, deepgram, aws, azure) are imported on first use
+from backends import get_backend, backend_params, warm_up, loaded_backends, get_scheduler
+from transcription_cache import TranscriptionCache
+from log_shipper import LogShipper
+from db_pool import get_pool
+from jobs import JobManager
+from listing_cache import ListingIndex
+from http_range import parse_range, RangeNotSatisfiable
+from staging import hash_file, prefetch, save_upload, stage_blob, stage_local_file
+from azure_client import get_blob_service_client, generate_sas_url
+import metrics
+from metrics import timed, gauge, histogram
 import requests
 import logging
+import time
+import atexit
 import traceback
-# Configure logging
+from json_logging import make_formatter
+from frontend_logs import (FrontendLogBuffer, build_record, read_body, InvalidLogBatch, BatchTooLarge,
+                           FRONTEND_LOG_MAX_BODY, RECORDS as FRONTEND_LOG_RECORDS)
+# Configure logging (JSON lines unless LOG_FORMAT=text)
+app_handler = logging.FileHandler('app.log')
+app_handler.setFormatter(make_formatter())
 logging.basicConfig(
-    filename='app.log',
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    handlers=[app_handler]
 )
 # REMOVE THIS if not needed
 frontend_logger = logging.getLogger('frontendLogger')
 frontend_logger.setLevel(logging.INFO)
 handler = logging.FileHandler('frontend.log')
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+formatter = make_formatter()
 handler.setFormatter(formatter)
 frontend_logger.addHandler(handler)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Events buffered for a streaming client before transcription waits for it to catch up
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+REQUEST_SECONDS = histogram("http_request_seconds", "Flask request latency", ("method", "endpoint", "status"))
 
 class AudioServerApp:
     def __init__(self):
@@ -39,25 +58,86 @@ class AudioServerApp:
         self.UPLOAD_FOLDER = os.path.abspath(UPLOAD_FOLDER)
         self.LOCAL_FOLDER_PATH = os.getenv("LOCAL_FOLDER_PATH")
         self.DB_CONN_STR = os.getenv("DB_CONN_STR")
+        # Deepgram gets Azure recordings through a read-only SAS URL instead of an upload
+        self.DEEPGRAM_AZURE_SAS = os.getenv("DEEPGRAM_AZURE_SAS", "false").lower() in ("1", "true")
+        # Old behaviour: serve the file to Deepgram through an ngrok tunnel
+        self.DEEPGRAM_USE_NGROK = os.getenv("DEEPGRAM_USE_NGROK", "false").lower() in ("1", "true")
+
+        # Logs are shipped to the DB by a background thread; requests only nudge it.
+        # Started by the first request, so the debug reloader's parent process, which
+        # serves none, does not run a second shipper over the same files.
+        self.log_shipper = LogShipper()
+        atexit.register(self.log_shipper.stop)
+        # Frontend log lines are appended to frontend.log in batches; each flush nudges the shipper.
+        # Registered after the shipper so atexit flushes the buffer before the shipper's final pass.
+        self.frontend_logs = FrontendLogBuffer(handler, on_flush=self.log_shipper.notify)
+        atexit.register(self.frontend_logs.stop)
+        # Background transcription for /api/jobs and /api/process-audio?async=true
+        self.jobs = JobManager(self.process_file)
+        self.transcription_cache = TranscriptionCache()
+        # Picks the backend for each file within per-backend concurrency limits
+        self.scheduler = get_scheduler()
+        # File listings are served from memory and re-read on TTL expiry or change
+        self.local_listing = ListingIndex(self.load_local_files, change_token=self.local_folder_token)
+        self.azure_listing = ListingIndex(self.load_azure_files)
+        @self.app.before_request
+        def before_any_request():
+            g.request_started = time.perf_counter()
+            self.log_shipper.start()
 
-        # Register setup_logs using the Flask decorator method inside the class
-        self._logs_initialized = False
         @self.app.after_request
         def after_any_request(response):
-            try:
-                process_logs()
-            except Exception as e:
-                logging.error(f"Error processing logs in after_request: {e}")
+            if request.endpoint not in ("log_from_frontend", "log_batch_from_frontend"):
+                # Frontend logs notify the shipper when their buffer is written instead
+                self.log_shipper.notify()
+            if hasattr(g, "request_started"):
+                # Streaming responses are timed until their first byte is ready
+                endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+                REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, method=request.method,
+                                        endpoint=endpoint, status=response.status_code)
             return response
+        self.register_gauges()
         self.setup_routes()
 
+    def register_gauges(self):
+        # Read when /metrics is scraped
+        gauge("transcription_files", "Files in the job queue by status", ("status",)).set_function(
+            lambda: {(status,): n for status, n in self.jobs.file_counts().items()})
+        gauge("backend_in_flight", "Files being transcribed per backend", ("backend",)).set_function(
+            lambda: {(name,): b["in_flight"] for name, b in self.scheduler.stats()["backends"].items()})
+        gauge("log_shipper_queue_depth", "Pending log shipping requests").set_function(
+            lambda: self.log_shipper.stats()["queue_depth"])
+        gauge("log_shipper_pending_bytes", "Log bytes not yet in the database").set_function(
+            lambda: self.log_shipper.stats()["pending_bytes"])
+        gauge("db_pool_connections", "Pooled DB connections by state", ("state",)).set_function(
+            lambda: {("in_use",): get_pool().stats()["in_use"], ("idle",): get_pool().stats()["idle"]})
+        gauge("transcription_cache_hit_rate", "Share of cache lookups served from disk or DB").set_function(
+            lambda: self.transcription_cache.stats()["hit_rate"])
+
     def setup_routes(self):
         self.app.route("/audio/<path:filename>", methods=["GET"])(self.serve_audio)
         self.app.route("/azure-audio/<path:filename>", methods=["GET"])(self.get_azure_audio)
         self.app.route("/api/local-files", methods=["GET"])(self.get_local_files)
         self.app.route("/api/azure-files", methods=["GET"])(self.get_azure_files)
         self.app.route("/api/process-audio", methods=["POST"])(self.process_audio_stream)
+        self.app.route("/api/process-audio/stream", methods=["POST"])(self.process_audio_events)
+        self.app.route("/api/jobs", methods=["POST"])(self.submit_job)
+        self.app.route("/api/jobs", methods=["GET"])(self.list_jobs)
+        self.app.route("/api/jobs/<job_id>", methods=["GET"])(self.get_job)
+        self.app.route("/api/jobs/<job_id>/results", methods=["GET"])(self.get_job_results)
         self.app.route("/api/log", methods=["POST"])(self.log_from_frontend)
+        self.app.route("/api/logs", methods=["POST"])(self.log_batch_from_frontend)
+        self.app.route("/api/log-shipper/status", methods=["GET"])(self.get_log_shipper_status)
+        self.app.route("/api/db-pool/status", methods=["GET"])(self.get_db_pool_status)
+        self.app.route("/api/warmup", methods=["POST"])(self.warm_up_backends)
+        self.app.route("/api/transcription-cache/status", methods=["GET"])(self.get_transcription_cache_status)
+        self.app.route("/api/deepgram/status", methods=["GET"])(self.get_deepgram_status)
+        self.app.route("/api/backends/status", methods=["GET"])(self.get_backends_status)
+        self.app.route("/metrics", methods=["GET"])(self.get_metrics)
+
+    def blob_service_client(self):
+        # Shared for the whole process so HTTP connections to Azure are reused
+        return get_blob_service_client(self.AZURE_CONNECTION_STRING)
 
     def serve_audio(self, filename):
         try:
@@ -69,94 +149,146 @@ class AudioServerApp:
             for path in full_paths:
                 logging.info(f"Looking for file at: {path}")
                 if os.path.exists(path):
+                    # conditional=True answers Range requests with 206 partial content,
+                    # streaming the file from disk instead of loading it
                     directory = os.path.dirname(path)
-                    return send_from_directory(directory, filename)
+                    return send_from_directory(directory, filename, conditional=True)
 
             raise FileNotFoundError(f"File '{filename}' not found in any expected location: {full_paths}")
         
+        except HTTPException:
+            # e.g. 416 for a Range past the end of the file
+            raise
         except Exception as e:
             logging.error(f"Error serving file '{filename}': {e}\n{traceback.format_exc()}")
             return jsonify({"error": str(e)}), 404
 
     def get_azure_audio(self, filename):
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(self.AZURE_CONNECTION_STRING)
+            blob_service_client = self.blob_service_client()
             blob_client = blob_service_client.get_blob_client(container=self.CONTAINER_NAME, blob=filename)
-            stream = blob_client.download_blob()
-            audio_data = stream.readall()
-            return Response(audio_data, mimetype="audio/mpeg")
+            properties = blob_client.get_blob_properties()
+            size = properties.size
+            headers = {"Accept-Ranges": "bytes"}
+            if properties.etag:
+                headers["ETag"] = properties.etag
+
+            try:
+                byte_range = parse_range(request.headers.get("Range"), size)
+            except RangeNotSatisfiable:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status=416, headers=headers)
+
+            if byte_range:
+                start, end = byte_range
+                stream = blob_client.download_blob(offset=start, length=end - start + 1)
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                status = 206
+            else:
+                stream = blob_client.download_blob()
+                headers["Content-Length"] = str(size)
+                status = 200
+
+            mimetype = mimetypes.guess_type(filename)[0] or "audio/mpeg"
+            # Hand chunks to the client as they arrive instead of buffering the whole blob
+            return Response(stream.chunks(), status=status, mimetype=mimetype, headers=headers,
+                            direct_passthrough=True)
         except Exception as e:
             logging.error(f"Error serving Azure audio: {e}\n{traceback.format_exc()}")
             return Response("Audio not found", status=404)
 
+    def load_local_files(self):
+        files = []
+        with os.scandir(self.LOCAL_FOLDER_PATH) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append({"name": entry.name, "size": stat.st_size, "last_modified": stat.st_mtime})
+        logging.info("Fetched local audio files successfully.")
+        return files
+
+    def local_folder_token(self):
+        # Adding, removing or renaming a file bumps the directory's mtime
+        return os.stat(self.LOCAL_FOLDER_PATH).st_mtime_ns
+
+    def load_azure_files(self):
+        blob_service_client = self.blob_service_client()
+        container_client = blob_service_client.get_container_client(self.CONTAINER_NAME)
+        files = [
+            {
+                "name": blob.name,
+                "size": blob.size,
+                "last_modified": blob.last_modified.timestamp() if blob.last_modified else 0,
+                "etag": blob.etag,
+            }
+            for blob in container_client.list_blobs()
+        ]
+        logging.info("Fetched Azure audio files successfully.")
+        return files
+
+    def list_files(self, index):
+        """Serve a listing from its cached index.
+
+        Query params: prefix, ext (comma-separated, default mp3,wav), sort (name|date),
+        order (asc|desc), limit, cursor, refresh. Without limit/cursor the response is
+        the plain list of names the Client expects; with them it is a page of
+        {items, next_cursor, total}.
+        """
+        args = request.args
+        extensions = tuple(f".{e.strip().lstrip('.').lower()}" for e in args.get("ext", "mp3,wav").split(",") if e.strip())
+        limit = args.get("limit", type=int)
+        cursor = args.get("cursor")
+        try:
+            items, next_cursor, total = index.query(
+                prefix=args.get("prefix"),
+                extensions=extensions,
+                sort=args.get("sort", "name"),
+                descending=args.get("order", "asc").lower() == "desc",
+                limit=max(limit, 1) if limit is not None else None,
+                cursor=cursor,
+                refresh=args.get("refresh", "").lower() in ("1", "true"),
+            )
+        except ValueError as e:
+            # Bad sort or cursor
+            return jsonify({"error": str(e)}), 400
+        if limit is None and cursor is None:
+            return jsonify([item["name"] for item in items])
+        return jsonify({"items": items, "next_cursor": next_cursor, "total": total})
+
     def get_local_files(self):
         try:
             if not self.LOCAL_FOLDER_PATH or not os.path.exists(self.LOCAL_FOLDER_PATH):
                 raise ValueError("LOCAL_FOLDER_PATH is not set or invalid.")
-            files = os.listdir(self.LOCAL_FOLDER_PATH)
-            audio_files = [f for f in files if f.endswith(".mp3") or f.endswith(".wav")]
-            logging.info("Fetched local audio files successfully.")
-            return jsonify(audio_files)
+            return self.list_files(self.local_listing)
         except Exception as e:
             logging.error(f"Error reading local files: {e}\n{traceback.format_exc()}")
             return jsonify({"error": str(e)}), 500
 
     def get_azure_files(self):
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(self.AZURE_CONNECTION_STRING)
-            container_client = blob_service_client.get_container_client(self.CONTAINER_NAME)
-            blobs = container_client.list_blobs()
-            audio_files = [blob.name for blob in blobs if blob.name.endswith(".mp3") or blob.name.endswith(".wav")]
-            logging.info("Fetched Azure audio files successfully.")
-            return jsonify(audio_files)
+            return self.list_files(self.azure_listing)
         except Exception as e:
             logging.error(f"Error fetching Azure files: {e}\n{traceback.format_exc()}")
             return jsonify({"error": str(e)}), 500
 
     def process_audio_stream(self):
+        # ?async=true hands the batch to the job queue and returns a job id straight away
+        if request.args.get("async", "").lower() in ("1", "true"):
+            return self.submit_job()
+        # ?stream=true sends results as they are produced (see process_audio_events)
+        if request.args.get("stream", "").lower() in ("1", "true"):
+            return self.process_audio_events()
         try:
             results = []
-            entity_id = 1
-            if request.is_json:
-                data = request.json
-                model = data.get("model")
-                filenames = data.get("files", [])
-                is_azure = data.get("isAzure", False)
-
-                for filename in filenames:
-                    filepath = os.path.join(self.UPLOAD_FOLDER, filename)
-
-                    if is_azure:
-                        blob_service_client = BlobServiceClient.from_connection_string(self.AZURE_CONNECTION_STRING)
-                        blob_client = blob_service_client.get_blob_client(container=self.CONTAINER_NAME, blob=filename)
-                        audio_data = blob_client.download_blob().readall()
-                        with open(filepath, "wb") as f:
-                            f.write(audio_data)
-                    elif os.path.exists(os.path.join(self.LOCAL_FOLDER_PATH, filename)):
-                        src_path = os.path.join(self.LOCAL_FOLDER_PATH, filename)
-                        with open(src_path, "rb") as src, open(filepath, "wb") as dst:
-                            dst.write(src.read())
-                    elif os.path.exists(filepath):
-                        pass
-                    else:
-                        raise FileNotFoundError(f"File not found: {filename}")
-                    self.insert_audio_file_to_db(entity_id, filename, filepath)
-                    logging.info(f"Processing file: {filename} with model: {model}")
-                    result = self.run_model(model, filepath)
-                    results.append({"filename": filename, "transcription": result["transcription"]})
-                    os.remove(filepath)
-
-            else:
-                model = request.form.get("model")
-                files = request.files.getlist("files")
-
-                for file in files:
-                    filename = secure_filename(file.filename)
-                    filepath = os.path.join(self.UPLOAD_FOLDER, filename)
-                    file.save(filepath)
-                    logging.info(f"Uploaded file: {filename}")
-                    self.insert_audio_file_to_db(entity_id, filename, filepath)
-                    result = self.run_model(model, filepath)
+            model, sources = self.collect_sources()
+            if model == "deepgram":
+                return jsonify(self.process_deepgram_batch(model, sources))
+            # The next files are downloaded/copied while the current one is transcribed
+            with closing(prefetch(sources, lambda s: self.stage_source(*s, model=model), discard=self.discard_staged)) as staged_sources:
+                for (filename, source, _), staged in staged_sources:
+                    filepath, file_hash = staged.result()
+                    result = self.transcribe_staged(model, filename, source, filepath, file_hash)
                     results.append({"filename": filename, "transcription": result["transcription"]})
             logging.info(f"Successfully processed {len(results)} file(s).")
             return jsonify(results)
@@ -165,61 +297,299 @@ class AudioServerApp:
             print("Error in transcription:", str(e))
             return jsonify({"error": str(e)}), 500
 
-    def run_model(self, model, filepath):
-        filename = os.path.basename(filepath)
+    def process_deepgram_batch(self, model, sources):
+        """Transcribe a batch with Deepgram, several files at a time, keeping the input order.
+
+        Deepgram does the work remotely, so files are staged and sent concurrently
+        within the dispatcher's rate limit rather than one after another.
+        """
+        # Imported here so DeepTranscript is only loaded once Deepgram is actually used
+        from deepgram_dispatch import get_dispatcher
+        transcriptions = get_dispatcher().map(lambda s: self.process_file(model, *s), sources)
+        logging.info(f"Successfully processed {len(transcriptions)} file(s) with Deepgram.")
+        return [
+            {"filename": filename, "transcription": result["transcription"]}
+            for (filename, _, _), result in zip(sources, transcriptions)
+        ]
+
+    def process_audio_events(self):
+        """Transcribe like /api/process-audio, streaming each result as it is produced.
+
+        The body is newline-delimited JSON ({"event": ..., ...} per line), or
+        Server-Sent Events when the client accepts text/event-stream or passes
+        ?format=sse. Events: file_started, segment, file_done, file_error (the
+        batch carries on) and finally done, or error if the batch itself failed.
+        """
+        try:
+            model, sources = self.collect_sources()
+        except Exception as e:
+            logging.error(f"Error reading stream request: {e}\n{traceback.format_exc()}")
+            return jsonify({"error": str(e)}), 500
+        sse = request.args.get("format") == "sse" or request.accept_mimetypes.best == "text/event-stream"
+        events = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        cancelled = threading.Event()
+
+        def emit(kind, **data):
+            # Waits while the queue is full, so a slow client slows transcription
+            # down instead of results piling up in memory
+            while not cancelled.is_set():
+                try:
+                    events.put((kind, data), timeout=1)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                self.stream_sources(model, sources, emit, cancelled)
+            except Exception as e:
+                logging.error(f"Streaming transcription error: {e}\n{traceback.format_exc()}")
+                emit("error", error=str(e))
+
+        def generate():
+            try:
+                while True:
+                    kind, data = events.get()
+                    if sse:
+                        yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+                    else:
+                        yield json.dumps({"event": kind, **data}) + "\n"
+                    if kind in ("done", "error"):
+                        break
+            finally:
+                # Also runs when the client disconnects: stop after the current file
+                cancelled.set()
+
+        threading.Thread(target=produce, name="transcribe-stream", daemon=True).start()
+        return Response(generate(), mimetype="text/event-stream" if sse else "application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    def stream_sources(self, model, sources, emit, cancelled):
+        """Transcribe sources, reporting progress through emit(event, **data)."""
+        def run(index, filename, source, staged):
+            if cancelled.is_set():
+                return False
+            emit("file_started", index=index, filename=filename)
+            try:
+                filepath, file_hash = staged()
+                result = self.transcribe_staged(
+                    model, filename, source, filepath, file_hash,
+                    on_segment=lambda segment: emit("segment", index=index, filename=filename, **segment))
+                emit("file_done", index=index, filename=filename, transcription=result["transcription"])
+                return True
+            except Exception as e:
+                logging.error(f"Error transcribing {filename}: {e}\n{traceback.format_exc()}")
+                emit("file_error", index=index, filename=filename, error=str(e))
+                return False
+
+        if model == "deepgram":
+            # Files run side by side on the Deepgram dispatcher and report in completion order
+            from deepgram_dispatch import get_dispatcher
+            dispatcher = get_dispatcher()
+            futures = [
+                dispatcher.submit(run, index, filename, source, partial(self.stage_source, filename, source, file_hash, model=model))
+                for index, (filename, source, file_hash) in enumerate(sources)
+            ]
+            outcomes = [future.result() for future in futures]
+        else:
+            outcomes = []
+            with closing(prefetch(sources, lambda s: self.stage_source(*s, model=model), discard=self.discard_staged)) as staged_sources:
+                for index, (item, staged) in enumerate(staged_sources):
+                    if cancelled.is_set():
+                        if not staged.exception():
+                            self.discard_staged(item, staged.result())
+                        break
+                    outcomes.append(run(index, item[0], item[1], staged.result))
+        succeeded = sum(outcomes)
+        emit("done", processed=succeeded, failed=len(sources) - succeeded)
+
+    def collect_sources(self):
+        """Read the model and (filename, source, file_hash) triples from a JSON or multipart request.
+
+        Uploaded files are saved to UPLOAD_FOLDER (and hashed on the way) here,
+        while the request is still open; other sources are hashed when staged.
+        """
+        if request.is_json:
+            data = request.json
+            source = "azure" if data.get("isAzure", False) else "local"
+            return data.get("model"), [(filename, source, None) for filename in data.get("files", [])]
+
+        model = request.form.get("model")
+        sources = []
+        for file in request.files.getlist("files"):
+            filename = secure_filename(file.filename)
+            filepath = os.path.join(self.UPLOAD_FOLDER, filename)
+            with timed("upload", model or ""):
+                file_hash = save_upload(file, filepath)
+            logging.info(f"Uploaded file: {filename}")
+            sources.append((filename, "upload", file_hash))
+        return model, sources
+
+    def stage_file(self, filename, is_azure, model=None):
+        """Bring a recording from Azure or LOCAL_FOLDER_PATH into UPLOAD_FOLDER.
+
+        Returns (filepath, sha256); every byte is read once, in chunks, and the
+        stage is timed under `model`, the model the file is staged for. Each call
+        stages to a path of its own, so files with the same name transcribed at
+        the same time (a batch, concurrent requests, jobs) never remove each
+        other's copy.
+        """
+        local_path = os.path.join(self.LOCAL_FOLDER_PATH, filename)
+        uploaded_path = os.path.join(self.UPLOAD_FOLDER, filename)
+        if not is_azure and not os.path.exists(local_path) and not os.path.exists(uploaded_path):
+            raise FileNotFoundError(f"File not found: {filename}")
+
+        fd, filepath = tempfile.mkstemp(dir=self.UPLOAD_FOLDER, prefix=".staged-", suffix=os.path.splitext(filename)[1])
+        os.close(fd)
+        try:
+            if is_azure:
+                blob_service_client = self.blob_service_client()
+                blob_client = blob_service_client.get_blob_client(container=self.CONTAINER_NAME, blob=filename)
+                with timed("download", model or ""):
+                    file_hash = stage_blob(blob_client, filepath)
+            elif os.path.exists(local_path):
+                with timed("copy", model or ""):
+                    file_hash = stage_local_file(local_path, filepath)
+            else:
+                # Already in UPLOAD_FOLDER: linked, so removing the staged copy leaves it in place
+                with timed("hash", model or ""):
+                    file_hash = stage_local_file(uploaded_path, filepath)
+        except BaseException:
+            os.remove(filepath)
+            raise
+        return filepath, file_hash
+
+    def stage_source(self, filename, source, file_hash=None, model=None):
+        """Return (filepath, sha256) for a file ready in UPLOAD_FOLDER. source is "azure", "local" or "upload"."""
+        if source == "upload":
+            return os.path.join(self.UPLOAD_FOLDER, filename), file_hash
+        return self.stage_file(filename, source == "azure", model)
+
+    def discard_staged(self, item, staged):
+        """Remove a file staged for (filename, source, file_hash) that will not be transcribed."""
+        filepath, _ = staged
+        if item[1] != "upload" and os.path.exists(filepath):
+            os.remove(filepath)
+
+    def process_file(self, model, filename, source, file_hash=None):
+        """Stage, register and transcribe one file."""
+        filepath, file_hash = self.stage_source(filename, source, file_hash, model)
+        return self.transcribe_staged(model, filename, source, filepath, file_hash)
+
+    def transcribe_staged(self, model, filename, source, filepath, file_hash, on_segment=None):
+        entity_id = 1
+        try:
+            with timed("db_audio_insert", model or ""):
+                # Recorded under the recording's name, as before staging paths became unique
+                audio_hash = self.insert_audio_file_to_db(
+                    entity_id, filename, os.path.join(self.UPLOAD_FOLDER, filename), file_hash or hash_file(filepath))
+            logging.info(f"Processing file: {filename} with model: {model}")
+            audio_url = self.deepgram_audio_url(filename, source) if model == "deepgram" else None
+            return self.run_model(model, filepath, audio_hash, audio_url, on_segment, filename=filename)
+        finally:
+            # Uploads stay in UPLOAD_FOLDER so the Client can play them back from /audio
+            if source != "upload" and os.path.exists(filepath):
+                os.remove(filepath)
+
+    def submit_job(self):
+        try:
+            model, sources = self.collect_sources()
+            if not sources:
+                return jsonify({"error": "No files to process"}), 400
+            job = self.jobs.submit(model, sources)
+            return jsonify({"job_id": job.id, "status_url": f"/api/jobs/{job.id}"}), 202
+        except Exception as e:
+            logging.error(f"Error submitting job: {e}\n{traceback.format_exc()}")
+            return jsonify({"error": str(e)}), 500
+
+    def list_jobs(self):
+        return jsonify(self.jobs.list())
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            return jsonify({"error": f"Job '{job_id}' not found"}), 404
+        return jsonify(job.to_dict())
+
+    def get_job_results(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            return jsonify({"error": f"Job '{job_id}' not found"}), 404
+        return jsonify(job.results())
+
+    def ngrok_audio_url(self, filename):
+        # Legacy path: Deepgram fetches the file back from /audio through a public ngrok tunnel
+        try:
+            NGROK_API_URL = "http://127.0.0.1:4040/api/tunnels"
+            ngrok_response = requests.get(NGROK_API_URL).json()
+            public_url = next(
+                (t["public_url"] for t in ngrok_response["tunnels"] if t["public_url"].startswith("https://")),
+                None
+            )
+            if not public_url:
+                raise Exception("No HTTPS ngrok tunnel found")
+            return f"{public_url}/audio/{filename}"
+        except Exception as e:
+            print("Deepgram ngrok URL error:", str(e))
+            raise
+
+    def deepgram_audio_url(self, filename, source):
+        """Pre-signed blob URL Deepgram can fetch directly, or None to upload the staged file."""
+        if source != "azure" or not self.DEEPGRAM_AZURE_SAS:
+            return None
+        try:
+            blob_client = self.blob_service_client().get_blob_client(container=self.CONTAINER_NAME, blob=filename)
+            return generate_sas_url(blob_client)
+        except Exception as e:
+            logging.warning(f"Could not create a SAS URL for {filename}, uploading it instead: {e}")
+            return None
+
+    def run_model(self, model, filepath, audio_hash=None, audio_url=None, on_segment=None, filename=None):
+        # Staged files have a name of their own; the DB rows use the recording's name
+        filename = filename or os.path.basename(filepath)
         
         model_name = model.lower() if model else "azure"  # default model name
         # Set entity_id to 1 by default
         entity_id = 1
+        params = backend_params(model_name)
         try:
-            if model == "deepgram":
-                try:
-                    NGROK_API_URL = "http://127.0.0.1:4040/api/tunnels"
-                    ngrok_response = requests.get(NGROK_API_URL).json()
-                    public_url = next(
-                        (t["public_url"] for t in ngrok_response["tunnels"] if t["public_url"].startswith("https://")),
-                        None
-                    )
-                    if not public_url:
-                        raise Exception("No HTTPS ngrok tunnel found")
-
-                    filename = os.path.basename(filepath)
-                    audio_url = f"{public_url}/audio/{filename}"
-                    logging.info(f"Sending audio to Deepgram: {audio_url}")
-                    result = analyze_audio_with_deepgram(audio_url)
-
-                    # ⬇️ Process and insert into DB
-                    transcription = result["transcription"]
-                    hash_value = hashlib.sha256(transcription.encode()).hexdigest()
-
-                    # ✅ INSERT into DB
-                    self.insert_transcription_to_db(entity_id, model_name, filename, hash_value, transcription)
-                    print("✅ Deepgram transcription inserted into DB.")
-
-                    return result
-
-                except Exception as e:
-                    print("Deepgram ngrok URL error:", str(e))
-                    raise
-
-                
-            elif model_name == "whisper":
-                result = process_audio_file(filepath)
-                
-            elif model_name == "aws":
-                result = process_audio_with_aws(filepath)
-                
-            elif model_name == "azure":
-                result = process_audio_with_azure(filepath)
-                
+            # Identical audio already transcribed by the same model is served from the cache
+            with timed("cache_lookup", model_name):
+                result = self.transcription_cache.get(audio_hash, model_name, params) if audio_hash else None
+            cached = result is not None
+            if cached:
+                logging.info(f"Transcription cache hit for: {filename} with model: {model_name}")
+
             else:
-                raise ValueError("Invalid model selected")
+                # Deepgram gets the file uploaded in the request body unless it can fetch it itself
+                if model_name == "deepgram" and audio_url is None and self.DEEPGRAM_USE_NGROK:
+                    audio_url = self.ngrok_audio_url(os.path.basename(filepath))
+                # The scheduler may hand the file to a fallback backend when this one is busy or fails
+                with timed("inference", model_name):
+                    backend_name, result = self.scheduler.run(
+                        model_name, filepath, audio_url=audio_url, on_segment=on_segment)
+                if backend_name != model_name:
+                    logging.info(f"{filename} was transcribed by {backend_name} instead of {model_name}")
+                    model_name, params = backend_name, backend_params(backend_name)
+                if "on_segment" in get_backend(backend_name).options:
+                    # Already reported while transcribing
+                    on_segment = None
+
+            if on_segment:
+                # Cache hits and backends that only return the finished result
+                for segment in result.get("segments", []):
+                    on_segment(segment)
+
+            # Backends flag failed transcriptions with "error"; those are never cached
+            if not cached and audio_hash and "error" not in result:
+                self.transcription_cache.put(audio_hash, model_name, result, params)
 
             transcription = result["transcription"]
             hash_value = hashlib.sha256(transcription.encode()).hexdigest()
 
             # Now insert transcription with entity_id and also model_name
-            self.insert_transcription_to_db(entity_id, model_name, filename, hash_value, transcription)
+            with timed("db_transcription_insert", model_name):
+                self.insert_transcription_to_db(entity_id, model_name, filename, hash_value, transcription)
             logging.info(f"Inserted transcription for file: {filename} into database.")
             
             return result
@@ -229,69 +599,125 @@ class AudioServerApp:
 
     def insert_transcription_to_db(self, entity_id, model_name, filename, hash_value, transcription_text):
         try:
-            conn = pyodbc.connect(self.DB_CONN_STR)
-            cursor = conn.cursor()
-            created_at = datetime.datetime.now()
-            updated_at = created_at
-
-            cursor.execute("""
-                EXEC InsertTranscriptionResult ?, ?, ?, ?, ?, ?, ?
-            """, (entity_id, model_name, filename, hash_value, transcription_text, created_at, updated_at))
-
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with get_pool().connection() as conn:
+                cursor = conn.cursor()
+                created_at = datetime.datetime.now()
+                updated_at = created_at
+
+                cursor.execute("""
+                    EXEC InsertTranscriptionResult ?, ?, ?, ?, ?, ?, ?
+                """, (entity_id, model_name, filename, hash_value, transcription_text, created_at, updated_at))
+
+                conn.commit()
+                cursor.close()
             logging.info(f"Database entry complete for: {filename}")
 
         except Exception as e:
+            metrics.ERRORS.inc(component="db_transcription_insert", error=type(e).__name__)
             logging.error(f"Database insertion error: {e}\n{traceback.format_exc()}")
 
     def run(self, port=5000, debug=True):
         self.app.run(port=port, debug=debug)
 
-    def insert_audio_file_to_db(self, entity_id, file_name, file_path):
+    def insert_audio_file_to_db(self, entity_id, file_name, file_path, file_hash=None):
+        """Register the file in the DB and return its SHA-256 (None if it could not be read).
+
+        Pass file_hash when it was already computed while staging the file.
+        """
         try:
             # Generate hash of the file for deduplication
-            with open(file_path, "rb") as f:
-                file_hash = hashlib.sha256(f.read()).hexdigest()
-
-            conn = pyodbc.connect(self.DB_CONN_STR)
-            cursor = conn.cursor()
-            created_at = datetime.datetime.now()
-            updated_at = created_at
-
-            cursor.execute("""
-                EXEC InsertAudioDetailsIfNotExists 
-                           ?, ?, ?, ?, ?, ?
-            """, (entity_id, file_name, file_path, file_hash, created_at, updated_at))
-
-            conn.commit()
-            cursor.close()
-            conn.close()
+            if file_hash is None:
+                file_hash = hash_file(file_path)
+
+            with get_pool().connection() as conn:
+                cursor = conn.cursor()
+                created_at = datetime.datetime.now()
+                updated_at = created_at
+
+                cursor.execute("""
+                    EXEC InsertAudioDetailsIfNotExists 
+                               ?, ?, ?, ?, ?, ?
+                """, (entity_id, file_name, file_path, file_hash, created_at, updated_at))
+
+                conn.commit()
+                cursor.close()
             print("✅ Audio file inserted or already exists in DB.")
         except Exception as e:
+            metrics.ERRORS.inc(component="db_audio_insert", error=type(e).__name__)
             logging.error(f"Error inserting audio file to DB: {e}\n{traceback.format_exc()}")
+        return file_hash
 
     def log_from_frontend(self):
         try:
-            log_data = request.json
-            level = log_data.get("level", "INFO").upper()
-            message = log_data.get("message", "")
-            metadata=log_data.get("metadata",{})
-            metadata_json = json.dumps(metadata)
-            log_msg=f"{message} | Metadata:{metadata}"
-            if level == "DEBUG":
-                frontend_logger.debug(message)
-            elif level == "WARNING":
-                frontend_logger.warning(message)
-            elif level == "ERROR":
-                frontend_logger.error(message)
-            else:
-                frontend_logger.info(log_msg)
+            self.frontend_logs.add([build_record(request.get_json(force=True), frontend_logger)])
+            FRONTEND_LOG_RECORDS.inc(outcome="accepted")
             return jsonify({"status": "logged"}), 200
+        except InvalidLogBatch as e:
+            FRONTEND_LOG_RECORDS.inc(outcome="rejected")
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logging.error(f"Frontend logging error: {e}\n{traceback.format_exc()}")
+            return jsonify({"error": str(e)}), 500
+
+    def log_batch_from_frontend(self):
+        """Many frontend log records in one request.
+
+        Body: a JSON array of {"level", "message", "metadata", "timestamp"} records
+        (or {"logs": [...]}), optionally sent with Content-Encoding: gzip. Invalid
+        records are reported by index and the rest are still accepted, so the
+        Client never resends a batch because of one bad record. Records are
+        buffered and written to frontend.log together; see Client/src/utils/Logger.tsx
+        for the client side of the contract.
+        """
+        if (request.content_length or 0) > FRONTEND_LOG_MAX_BODY:
+            return jsonify({"error": f"Body is larger than {FRONTEND_LOG_MAX_BODY} bytes"}), 413
+        try:
+            logs = read_body(request.get_data(cache=False), request.headers.get("Content-Encoding"))
+        except BatchTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+        except InvalidLogBatch as e:
+            return jsonify({"error": str(e)}), 400
+
+        records, rejected = [], []
+        for index, log in enumerate(logs):
+            try:
+                records.append(build_record(log, frontend_logger))
+            except InvalidLogBatch as e:
+                rejected.append({"index": index, "error": str(e)})
+        try:
+            self.frontend_logs.add(records)
         except Exception as e:
             logging.error(f"Frontend logging error: {e}\n{traceback.format_exc()}")
             return jsonify({"error": str(e)}), 500
+        FRONTEND_LOG_RECORDS.inc(len(records), outcome="accepted")
+        FRONTEND_LOG_RECORDS.inc(len(rejected), outcome="rejected")
+        return jsonify({"accepted": len(records), "rejected": rejected}), 202
+
+    def get_log_shipper_status(self):
+        return jsonify(dict(self.log_shipper.stats(), frontend_buffer=self.frontend_logs.stats()))
+
+    def get_db_pool_status(self):
+        return jsonify(get_pool().stats())
+
+    def get_transcription_cache_status(self):
+        return jsonify(self.transcription_cache.stats())
+
+    def get_deepgram_status(self):
+        from deepgram_dispatch import get_dispatcher
+        return jsonify(get_dispatcher().stats())
+
+    def get_metrics(self):
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    def get_backends_status(self):
+        return jsonify(self.scheduler.stats())
+
+    def warm_up_backends(self):
+        # Body: {"models": ["whisper", "deepgram"]}; omit to warm every backend
+        data = request.get_json(silent=True) or {}
+        report = warm_up(data.get("models"))
+        return jsonify({"backends": report, "loaded": loaded_backends()})
+
 if __name__ == "__main__":
     app_instance = AudioServerApp()
     app_instance.run(port=5000)
@@ -1,22 +1,87 @@
-import whisper
+import os
 import traceback
+from whisper_server import get_server, WHISPER_RESULT_TIMEOUT
+from preprocess import prepare, window_segments, join_segments, SAMPLE_RATE
+from metrics import timed, counter
 
-transcribe_model = whisper.load_model("base")
+# Decode once, drop silence and transcribe long calls as parallel segments
+WHISPER_PREPROCESS = os.getenv("WHISPER_PREPROCESS", "true").lower() in ("1", "true")
+
+# The model lives in warm worker processes (see whisper_server.py), so importing
+# this module stays cheap for the web tier.
 # translate_model = whisper.load_model("medium")
 
-def process_audio_file(file_path):
+AUDIO_SECONDS = counter("whisper_audio_seconds_total", "Seconds of audio decoded, and of speech kept after VAD",
+                        ("kind",))
+
+
+def _prepare(file_path):
+    with timed("preprocess", "whisper"):
+        audio, segments, duration = prepare(file_path)
+    AUDIO_SECONDS.inc(duration, kind="decoded")
+    AUDIO_SECONDS.inc(sum(end - start for start, end in segments) / SAMPLE_RATE, kind="speech")
+    print(f"Pre-processed {duration:.1f}s of audio into {len(segments)} segment(s)")
+    return audio, segments
+
+
+def transcribe_segments(file_path, on_segment=None):
+    """Transcribe the speech in a recording as segments spread over the Whisper pool."""
+    audio, segments = _prepare(file_path)
+    return transcribe_prepared(audio, segments, on_segment)
+
+
+def transcribe_prepared(audio, segments, on_segment=None):
+    """on_segment(segment) is called for each stitched segment, in order, as soon
+    as the window it belongs to is done.
+    """
+    server = get_server()
+    futures = [server.submit(audio[start:end], timestamps=_overlaps(segments, index))
+               for index, (start, end) in enumerate(segments)]
+    merged = []
+    for index, future in enumerate(futures):
+        for segment in window_segments(segments, index, future.result(WHISPER_RESULT_TIMEOUT)):
+            merged.append(segment)
+            if on_segment:
+                on_segment(segment)
+    return join_segments(merged)
+
+
+def _overlaps(segments, index):
+    # window_segments() splits the shared audio by segment timestamps
+    start, end = segments[index]
+    return ((index > 0 and segments[index - 1][1] > start)
+            or (index + 1 < len(segments) and segments[index + 1][0] < end))
+
+
+def transcribe(file_path, on_segment=None):
+    if WHISPER_PREPROCESS:
+        try:
+            audio, segments = _prepare(file_path)
+        except Exception as e:
+            # e.g. a format only Whisper's own loader can read; fall back to the whole file
+            print("Pre-processing failed, transcribing the whole file:", str(e))
+        else:
+            return transcribe_prepared(audio, segments, on_segment)
+    return get_server().transcribe(file_path, timeout=WHISPER_RESULT_TIMEOUT)
+
+
+def process_audio_file(file_path, on_segment=None):
     print(f"Processing file: {file_path}")
     
     # Transcription
+    error = None
+    segments = []
     try:
         print("Transcribing...")
-        transcription_result = transcribe_model.transcribe(file_path)
+        transcription_result = transcribe(file_path, on_segment)
         transcription_text = transcription_result["text"]
+        segments = transcription_result.get("segments", [])
         print('Transcription:', transcription_text)
     except Exception as e:
         print("Transcription error:", str(e))
         traceback.print_exc()
         transcription_text = "Error transcribing audio."
+        error = str(e)
 
     # # Translation
     # try:
@@ -29,7 +94,11 @@ def process_audio_file(file_path):
     #     traceback.print_exc()
     #     translation_text = "Error translating audio."
 
-    return {
+    result = {
         "transcription": transcription_text,
+        "segments": segments,
         # "translation": translation_text
     }
+    if error:
+        result["error"] = error
+    return result
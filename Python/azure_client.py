@@ -0,0 +1,54 @@
+import os
+import datetime
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+# Size of each ranged GET; also what /azure-audio holds in memory per listener
+AZURE_MAX_CHUNK_GET_SIZE = int(os.getenv("AZURE_MAX_CHUNK_GET_SIZE", str(4 * 1024 * 1024)))
+AZURE_MAX_SINGLE_GET_SIZE = int(os.getenv("AZURE_MAX_SINGLE_GET_SIZE", str(4 * 1024 * 1024)))
+# Lifetime of the read-only URLs handed to Deepgram for Azure recordings
+AZURE_SAS_EXPIRY_MINUTES = int(os.getenv("AZURE_SAS_EXPIRY_MINUTES", "30"))
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_blob_service_client(connection_string=None):
+    """One BlobServiceClient per connection string for the whole process.
+
+    The client owns the HTTP session, so sharing it keeps connections alive
+    across requests instead of paying a new TCP/TLS handshake every time.
+    """
+    connection_string = connection_string or os.getenv("AZURE_CONNECTION_STRING")
+    client = _clients.get(connection_string)
+    if client is None:
+        with _lock:
+            client = _clients.get(connection_string)
+            if client is None:
+                # Imported here so the Azure SDK is only loaded once Azure is actually used
+                from azure.storage.blob import BlobServiceClient
+                client = BlobServiceClient.from_connection_string(
+                    connection_string,
+                    max_chunk_get_size=AZURE_MAX_CHUNK_GET_SIZE,
+                    max_single_get_size=AZURE_MAX_SINGLE_GET_SIZE,
+                )
+                _clients[connection_string] = client
+    return client
+
+
+def generate_sas_url(blob_client, expiry_minutes=AZURE_SAS_EXPIRY_MINUTES):
+    """Return a short-lived, read-only URL for the blob, for services that fetch it themselves."""
+    from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+    account_key = getattr(blob_client.credential, "account_key", None)
+    if not account_key:
+        raise ValueError("A SAS URL needs an account key in AZURE_CONNECTION_STRING")
+    sas = generate_blob_sas(
+        account_name=blob_client.account_name,
+        container_name=blob_client.container_name,
+        blob_name=blob_client.blob_name,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        expiry=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=expiry_minutes),
+    )
+    return f"{blob_client.url}?{sas}"
@@ -0,0 +1,270 @@
+import os
+import importlib
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+# Seconds a file waits for a free slot on its backend (when no fallback has one)
+BACKEND_QUEUE_TIMEOUT = float(os.getenv("BACKEND_QUEUE_TIMEOUT", "600"))
+# Backends tried, in order, when the requested one fails or is full,
+# e.g. "whisper:deepgram;deepgram:whisper". Off by default since it can route to paid services.
+BACKEND_FALLBACKS = os.getenv("BACKEND_FALLBACKS", "")
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+class Backend:
+    """A transcription backend and what the scheduler needs to know about it.
+
+    `target` ("module:function") is imported the first time the backend is used,
+    so the web process starts without pulling in model or SDK code it may never
+    need. The function is called as fn(file_path, **options) with only the
+    `options` it declares (e.g. on_segment, audio_url). `max_concurrency` caps
+    the files in flight, `max_batch` is how many clips the backend decodes in
+    one pass (1 when it takes them one at a time) and `cost` is USD per audio
+    minute (0 for local models).
+    """
+
+    def __init__(self, name, target, max_concurrency=1, max_batch=1, cost=0.0, options=(), warmup=None,
+                 params=None):
+        self.name = name
+        self.target = target
+        self.max_concurrency = max(int(os.getenv(f"{name.upper()}_MAX_CONCURRENCY", max_concurrency)), 1)
+        self.max_batch = max(int(max_batch), 1)
+        self.cost = float(os.getenv(f"{name.upper()}_COST_PER_MINUTE", cost))
+        self.options = frozenset(options)
+        self.warmup = warmup
+        self.params = params
+        self.fn = None
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {"in_flight": 0, "completed": 0, "failed": 0, "queued": 0}
+
+    def load(self):
+        if self.fn is None:
+            with self._lock:
+                if self.fn is None:
+                    try:
+                        self.fn = _resolve(self.target)
+                    except ImportError as e:
+                        raise BackendUnavailable(f"Backend '{self.name}' is not installed: {e}") from e
+        return self.fn
+
+    def __call__(self, file_path, **options):
+        return self.load()(file_path, **{k: v for k, v in options.items() if k in self.options and v is not None})
+
+    def acquire(self, timeout=None):
+        """Take a concurrency slot; timeout=0 only succeeds if one is free now."""
+        if timeout is None:
+            acquired = self._slots.acquire()
+        elif timeout > 0:
+            acquired = self._slots.acquire(timeout=timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if acquired:
+            self._count("in_flight", 1)
+        return acquired
+
+    def release(self, failed=False):
+        self._count("in_flight", -1)
+        self._count("failed" if failed else "completed", 1)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_concurrency=self.max_concurrency, max_batch=self.max_batch,
+                        cost_per_minute=self.cost,
+                        loaded=self.fn is not None)
+
+    def _count(self, name, delta):
+        with self._lock:
+            self._stats[name] += delta
+
+
+# Transcription backends keyed by the `model` name sent to /api/process-audio
+REGISTRY = {
+    "whisper": Backend(
+        "whisper", "audio:process_audio_file",
+        # Files in flight; the worker pool splits and batches their segments itself
+        max_concurrency=2 * int(os.getenv("WHISPER_WORKERS", "1")),
+        # Short segments are decoded together by each worker (whisper_server)
+        max_batch=int(os.getenv("WHISPER_BATCH_SIZE", "8")),
+        options=("on_segment",),
+        warmup="whisper_server:warm_up",
+        params=lambda: {
+            "model": os.getenv("WHISPER_MODEL", "base"),
+            "preprocess": os.getenv("WHISPER_PREPROCESS", "true").lower() in ("1", "true"),
+            "segment_seconds": float(os.getenv("WHISPER_SEGMENT_SECONDS", "30")),
+            "vad_threshold_db": float(os.getenv("VAD_THRESHOLD_DB", "-40")),
+        },
+    ),
+    "deepgram": Backend(
+        "deepgram", "deepgram_dispatch:transcribe",
+        max_concurrency=int(os.getenv("DEEPGRAM_CONCURRENCY", "8")),
+        cost=0.0043,
+        options=("audio_url",),
+        params=lambda: {"model": os.getenv("DEEPGRAM_MODEL", "nova-3")},
+    ),
+    "aws": Backend("aws", "aws_audio:process_audio_with_aws", max_concurrency=4, cost=0.024),
+    "azure": Backend("azure", "azure_audio:process_audio_with_azure", max_concurrency=4, cost=0.017),
+}
+
+
+def _parse_fallbacks(spec):
+    fallbacks = {}
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        name, _, targets = entry.partition(":")
+        fallbacks[name.strip()] = [t.strip() for t in targets.split(",") if t.strip()]
+    return fallbacks
+
+
+def _resolve(target):
+    module_name, attr = target.split(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_backend(name):
+    """Return the Backend for a model name, importing its code on first use."""
+    backend = REGISTRY.get(name)
+    if backend is None:
+        raise ValueError("Invalid model selected")
+    backend.load()
+    return backend
+
+
+def backend_params(name):
+    """Settings that change a backend's output; part of the transcription cache key."""
+    backend = REGISTRY.get(name)
+    return backend.params() if backend and backend.params else {}
+
+
+def warm_up(names=None):
+    """Load the given backends (all by default) and report how long each took."""
+    report = {}
+    for name in names or REGISTRY:
+        started = time.perf_counter()
+        try:
+            backend = get_backend(name)
+            if backend.warmup:
+                _resolve(backend.warmup)()
+            report[name] = {"status": "ready", "seconds": round(time.perf_counter() - started, 3)}
+        except Exception as e:
+            logging.error(f"Warm-up failed for backend '{name}': {e}")
+            report[name] = {"status": "error", "error": str(e)}
+    return report
+
+
+def loaded_backends():
+    return sorted(name for name, backend in REGISTRY.items() if backend.fn is not None)
+
+
+class Scheduler:
+    """Routes each file to a backend within the backends' concurrency limits.
+
+    The requested backend is used when it has a free slot. When it is full, the
+    file overflows to the cheapest configured fallback that has one; when none
+    has, it waits for the requested backend. A failure (an exception or a result
+    flagged with "error") moves on to the next fallback, so Whisper on a
+    GPU-less host is not swamped while a cloud backend sits idle.
+    """
+
+    def __init__(self, registry=None, fallbacks=None, queue_timeout=BACKEND_QUEUE_TIMEOUT):
+        self.registry = REGISTRY if registry is None else registry
+        self.fallbacks = _parse_fallbacks(BACKEND_FALLBACKS) if fallbacks is None else fallbacks
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._rerouted = {}     # (from, to) -> count
+
+    def run(self, name, file_path, **options):
+        """Transcribe file_path; returns (backend name that produced it, result)."""
+        if name not in self.registry:
+            raise ValueError("Invalid model selected")
+        candidates = [name] + [f for f in self.fallbacks.get(name, []) if f != name and f in self.registry]
+        last_error, last_result = None, None
+        while candidates:
+            backend = self._acquire(candidates, name)
+            if backend is None:
+                # None of the remaining fallbacks is installed
+                break
+            candidates.remove(backend.name)
+            try:
+                result = backend(file_path, **options)
+            except Exception as e:
+                backend.release(failed=True)
+                last_error, last_result = e, None
+                logging.error(f"Backend '{backend.name}' failed on {file_path}: {e}")
+                continue
+            failed = isinstance(result, dict) and "error" in result
+            backend.release(failed=failed)
+            if failed and candidates:
+                last_error, last_result = None, (backend.name, result)
+                logging.error(f"Backend '{backend.name}' failed on {file_path}: {result['error']}")
+                continue
+            if backend.name != name:
+                self._count_reroute(name, backend.name)
+            return backend.name, result
+        # Every backend tried has failed: report the last failure, not a missing fallback
+        if last_result:
+            return last_result
+        raise last_error
+
+    def stats(self):
+        with self._lock:
+            rerouted = [{"from": a, "to": b, "files": n} for (a, b), n in self._rerouted.items()]
+        return {
+            "backends": {name: backend.stats() for name, backend in self.registry.items()},
+            "fallbacks": self.fallbacks,
+            "rerouted": rerouted,
+        }
+
+    def _acquire(self, candidates, requested):
+        """Take a slot on the first candidate or, if it is full, the cheapest free one.
+
+        The requested backend must load; fallbacks that are not installed are
+        dropped from `candidates`, and None is returned when none is left.
+        """
+        usable = []
+        for name in list(candidates):
+            try:
+                self.registry[name].load()
+                usable.append(self.registry[name])
+            except BackendUnavailable as e:
+                if name == requested:
+                    raise
+                logging.warning(f"Skipping fallback: {e}")
+                candidates.remove(name)
+        if not usable:
+            return None
+        first = usable[0]
+        for backend in [first] + sorted(usable[1:], key=lambda b: b.cost):
+            if backend.acquire(timeout=0):
+                return backend
+        first._count("queued", 1)
+        try:
+            acquired = first.acquire(timeout=self.queue_timeout)
+        finally:
+            first._count("queued", -1)
+        if not acquired:
+            raise BackendUnavailable(f"Backend '{first.name}' is busy: no slot within {self.queue_timeout}s")
+        return first
+
+    def _count_reroute(self, src, dst):
+        with self._lock:
+            self._rerouted[(src, dst)] = self._rerouted.get((src, dst), 0) + 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
@@ -0,0 +1,79 @@
+"""Compare sending a Deepgram batch one file at a time with the concurrent dispatcher.
+
+Both runs go to the local stub (stubs/deepgram_stub.py) with a fixed per-request
+latency and an optional failure rate, so the numbers show dispatch overhead,
+concurrency and retries rather than network or model speed. Usage (from the
+Python/ directory):
+
+    python benchmarks/deepgram_dispatch_benchmark.py --files 50 --latency 0.2 --fail-rate 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PYTHON_DIR, os.path.join(PYTHON_DIR, "stubs")]
+
+from deepgram_stub import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size", type=int, default=256 * 1024, help="bytes per fake recording")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="requests per second, 0 = unlimited")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency, fail_rate=args.fail_rate)
+    os.environ["DEEPGRAM_API_URL"] = server.url
+    os.environ.setdefault("DEEPGRAM_API_KEY", "benchmark")
+    # Imported after DEEPGRAM_API_URL is set, which DeepTranscript reads at import time
+    import DeepTranscript
+    from deepgram_dispatch import DeepgramDispatcher
+    DeepTranscript.print = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"call_{i}.wav")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.size))
+            paths.append(path)
+
+        report = {"files": args.files, "latency": args.latency, "fail_rate": args.fail_rate}
+
+        sequential = DeepgramDispatcher(max_concurrency=1, rate=0)
+        started = time.perf_counter()
+        try:
+            sequential.transcribe_many(paths)
+            report["sequential_seconds"] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            report["sequential_error"] = str(e)
+        report["sequential_stats"] = sequential.stats()
+
+        concurrent = DeepgramDispatcher(max_concurrency=args.concurrency, rate=args.rate,
+                                        burst=args.concurrency)
+        started = time.perf_counter()
+        try:
+            concurrent.transcribe_many(paths)
+            report["concurrent_seconds"] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            report["concurrent_error"] = str(e)
+        report["concurrent_stats"] = concurrent.stats()
+
+        if "sequential_seconds" in report and "concurrent_seconds" in report:
+            report["speedup"] = round(report["sequential_seconds"] / report["concurrent_seconds"], 1)
+        sequential.shutdown()
+        concurrent.shutdown()
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""End-to-end load test of the Flask app against local stand-ins.
+
+The app runs in-process behind a real HTTP server, with SQLite in place of SQL
+Server (stubs/sqlite_odbc.py), a directory in place of Azure Blob Storage
+(stubs/blob_store.py) and the Deepgram stub (stubs/deepgram_stub.py);
+--whisper also runs the real Whisper "tiny" model. Scenarios:
+
+  process_audio   POST /api/process-audio with local and Azure batches of --files recordings
+  azure_files     GET /api/azure-files on a container of --blobs blobs (cold = ?refresh=true)
+  azure_audio     GET /azure-audio/<blob>, whole and 64 KiB ranges, for each of --audio-sizes
+  log, logs       POST /api/log one record at a time and /api/logs in batches, per --message-sizes
+  process_logs    logger.process_logs() with --log-lines new lines in each log file
+
+Each result has throughput and p50/p99 latency. The report is written as JSON
+to --output; pass an earlier report as --baseline to list what got slower than
+--tolerance allows (the exit status is 1 if anything did). Usage (from the
+Python/ directory):
+
+    python benchmarks/load_benchmark.py --output load_report.json
+    python benchmarks/load_benchmark.py --scenarios azure_files,log --baseline load_report.json --output new.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PYTHON_DIR, os.path.join(PYTHON_DIR, "stubs")]
+
+import requests
+
+SCENARIOS = ("azure_files", "azure_audio", "log", "logs", "process_audio", "process_logs")
+CONTAINER = "recordings"
+AZURE_CONNECTION_STRING = "UseLocalStore=true"
+RANGE_BYTES = 64 * 1024
+SAMPLE_RATE = 16000
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(math.ceil(q / 100 * len(ordered)) - 1, 0))]
+
+
+def progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+class Client:
+    """One requests.Session per thread, so connections are reused like a browser would."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._local = threading.local()
+
+    def request(self, method, path, **kwargs):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.request(method, self.base_url + path, timeout=600, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+
+def measure(scenario, params, call, requests_count, concurrency=1, unit=None):
+    """Run call(i) for i in range(requests_count) on `concurrency` threads.
+
+    call returns how many `unit`s it handled (files, bytes, records, lines);
+    an exception counts as an error.
+    """
+    latencies, errors, handled = [], [], [0]
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            count = call(i)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            handled[0] += count or 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        list(pool.map(one, range(requests_count)))
+    seconds = time.perf_counter() - started
+
+    result = {
+        "scenario": scenario,
+        "params": params,
+        "requests": requests_count,
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(latencies) / seconds, 2) if seconds else None,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "max_ms": _ms(max(latencies, default=None)),
+    }
+    if unit:
+        result[f"{unit}_per_second"] = round(handled[0] / seconds, 2) if seconds else None
+    if errors:
+        result["first_error"] = errors[0]
+    progress(f"{scenario:<14} {json.dumps(params):<48} p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+             f"rps={result['requests_per_second']} errors={len(errors)}")
+    return result
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def write_wav(path, seconds, seed):
+    """A short recording: a tone with noise and a pause, unique per seed so nothing hits the cache."""
+    rng = random.Random(seed)
+    frequency = rng.uniform(200, 800)
+    frames = bytearray()
+    for n in range(int(seconds * SAMPLE_RATE)):
+        t = n / SAMPLE_RATE
+        level = 0.02 if seconds / 2 < t < seconds / 2 + 0.5 else 0.4
+        sample = level * math.sin(2 * math.pi * frequency * t) + rng.uniform(-0.02, 0.02)
+        frames += int(max(min(sample, 1), -1) * 32767).to_bytes(2, "little", signed=True)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(bytes(frames))
+
+
+def bench_azure_files(client, ctx, args):
+    results = []
+    container = os.path.join(ctx["blobs"], CONTAINER)
+    os.makedirs(container, exist_ok=True)
+    existing = 0
+    for count in sorted(args.blobs):
+        # The container grows to each size in turn
+        for i in range(existing, count):
+            with open(os.path.join(container, f"listing_{i:07d}.wav"), "wb") as f:
+                f.write(b"RIFF")
+        existing = max(existing, count)
+        params = {"blobs": count}
+        results.append(measure("azure_files", dict(params, cache="cold"),
+                               lambda i: len(client.request("GET", "/api/azure-files?refresh=true").json()),
+                               args.cold_requests))
+        results.append(measure("azure_files", dict(params, cache="warm"),
+                               lambda i: len(client.request("GET", "/api/azure-files").json()),
+                               args.requests, args.concurrency))
+        results.append(measure("azure_files", dict(params, cache="warm", limit=100),
+                               lambda i: len(client.request("GET", "/api/azure-files?limit=100").json()["items"]),
+                               args.requests, args.concurrency))
+    return results
+
+
+def bench_azure_audio(client, ctx, args):
+    results = []
+    container = os.path.join(ctx["blobs"], CONTAINER)
+    os.makedirs(container, exist_ok=True)
+    for size in args.audio_sizes:
+        name = f"audio_{size}.wav"
+        with open(os.path.join(container, name), "wb") as f:
+            f.write(os.urandom(size))
+
+        def whole(i):
+            response = client.request("GET", f"/azure-audio/{name}", stream=True)
+            return sum(len(chunk) for chunk in response.iter_content(1024 * 1024))
+
+        def ranged(i):
+            start = random.randrange(max(size - RANGE_BYTES, 1))
+            response = client.request("GET", f"/azure-audio/{name}",
+                                      headers={"Range": f"bytes={start}-{start + RANGE_BYTES - 1}"})
+            return len(response.content)
+
+        results.append(measure("azure_audio", {"bytes": size, "range": False}, whole,
+                               args.requests, args.concurrency, unit="bytes"))
+        results.append(measure("azure_audio", {"bytes": size, "range": True}, ranged,
+                               args.requests, args.concurrency, unit="bytes"))
+    return results
+
+
+def _log_record(i, size):
+    return {
+        "level": ("info", "warn", "error")[i % 3],
+        "message": f"event {i} " + "x" * max(size - 12, 0),
+        "metadata": {"component": "load_benchmark", "i": i},
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def bench_log(client, ctx, args):
+    results = []
+    for size in args.message_sizes:
+        def single(i, size=size):
+            client.request("POST", "/api/log", json=_log_record(i, size))
+            return 1
+        results.append(measure("log", {"message_bytes": size}, single, args.requests, args.concurrency,
+                               unit="records"))
+    return results
+
+
+def bench_logs(client, ctx, args):
+    results = []
+    for size in args.message_sizes:
+        def batch(i, size=size):
+            records = [_log_record(i * args.log_batch + n, size) for n in range(args.log_batch)]
+            return client.request("POST", "/api/logs", json=records).json()["accepted"]
+        results.append(measure("logs", {"message_bytes": size, "batch": args.log_batch}, batch,
+                               max(args.requests // 10, 1), args.concurrency, unit="records"))
+    return results
+
+
+def bench_process_audio(client, ctx, args):
+    results = []
+    container = os.path.join(ctx["blobs"], CONTAINER)
+    os.makedirs(container, exist_ok=True)
+    seed = 0
+    for model in args.models:
+        for source in ("local", "azure"):
+            folder = ctx["local"] if source == "local" else container
+            for count in args.files:
+                batches = []
+                for b in range(args.batches):
+                    names = []
+                    for n in range(count):
+                        seed += 1
+                        name = f"call_{model}_{seed:06d}.wav"
+                        write_wav(os.path.join(folder, name), args.duration, seed)
+                        names.append(name)
+                    batches.append(names)
+
+                def run(i, names_by_batch=batches):
+                    body = {"model": model, "files": names_by_batch[i], "isAzure": source == "azure"}
+                    transcriptions = client.request("POST", "/api/process-audio", json=body).json()
+                    if len(transcriptions) != len(names_by_batch[i]):
+                        raise RuntimeError(f"Expected {len(names_by_batch[i])} results, got {transcriptions}")
+                    return len(transcriptions)
+
+                results.append(measure("process_audio", {"model": model, "source": source, "files": count},
+                                       run, args.batches, unit="files"))
+    return results
+
+
+def _write_log_files(directory, lines, run):
+    from json_logging import dumps
+    base = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=run)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "app.log"), "w", encoding="utf-8") as backend, \
+            open(os.path.join(directory, "frontend.log"), "w", encoding="utf-8") as frontend:
+        for i in range(lines):
+            ts = (base + datetime.timedelta(milliseconds=i)).isoformat(timespec="milliseconds")
+            backend.write(dumps({"ts": ts, "level": "INFO", "logger": "root",
+                                 "message": f"Processing file: call_{i}.wav with model: deepgram"}) + "\n")
+            frontend.write(dumps({"ts": ts, "level": "INFO", "logger": "frontendLogger",
+                                  "message": f"user clicked the process button {i}",
+                                  "metadata": {"files": [f"call_{i}.wav"], "model": "deepgram"}}) + "\n")
+
+
+def bench_process_logs(ctx, args):
+    """Runs after the app has stopped: logger reads app.log / frontend.log from the working directory."""
+    import logger
+    results = []
+    for lines in args.log_lines:
+        directories = [os.path.join(ctx["work"], f"logs_{lines}_{r}") for r in range(args.log_repeats)]
+        for r, directory in enumerate(directories):
+            _write_log_files(directory, lines, run=len(results) * args.log_repeats + r)
+
+        def ship(i, directories=directories, lines=lines):
+            os.chdir(directories[i])
+            shipped = logger.process_logs()
+            if shipped != 2 * lines:
+                raise RuntimeError(f"Shipped {shipped} of {2 * lines} lines")
+            return shipped
+
+        try:
+            results.append(measure("process_logs", {"lines_per_file": lines}, ship, args.log_repeats, unit="lines"))
+        finally:
+            os.chdir(ctx["work"])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Metrics that moved beyond `tolerance` (a fraction) against a baseline report's matching results."""
+    def key(result):
+        return result["scenario"], json.dumps(result["params"], sort_keys=True)
+
+    previous = {key(r): r for r in baseline.get("results", [])}
+    changes = []
+    for result in results:
+        old = previous.get(key(result))
+        if not old:
+            continue
+        for metric in ("p50_ms", "p99_ms", "requests_per_second"):
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            # Latency regresses upwards, throughput downwards
+            regressed = ratio > 1 + tolerance if metric.endswith("_ms") else ratio < 1 - tolerance
+            changes.append({"scenario": result["scenario"], "params": result["params"], "metric": metric,
+                            "baseline": before, "current": after, "ratio": round(ratio, 3),
+                            "regressed": regressed})
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of the scenarios")
+    parser.add_argument("--files", type=int_list, default=[1, 10, 50], help="recordings per /api/process-audio batch")
+    parser.add_argument("--batches", type=int, default=3, help="batches per file count")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per generated recording")
+    parser.add_argument("--blobs", type=int_list, default=[100, 1000, 10000], help="container sizes for listings")
+    parser.add_argument("--audio-sizes", type=int_list, default=[1024 * 1024, 16 * 1024 * 1024])
+    parser.add_argument("--message-sizes", type=int_list, default=[100, 1000, 8000], help="log message bytes")
+    parser.add_argument("--log-batch", type=int, default=100, help="records per /api/logs request")
+    parser.add_argument("--log-lines", type=int_list, default=[1000, 10000, 100000], help="new lines per log file")
+    parser.add_argument("--log-repeats", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="requests per read/log measurement")
+    parser.add_argument("--cold-requests", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--deepgram-latency", type=float, default=0.05, help="seconds per stub Deepgram call")
+    parser.add_argument("--blob-latency", type=float, default=0.0, help="seconds per blob store call")
+    parser.add_argument("--whisper", action="store_true", help='also transcribe with the Whisper "tiny" model')
+    parser.add_argument("--workdir", help="keep logs, uploads and the SQLite file here instead of a temp dir")
+    parser.add_argument("--output", default="load_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+    args.models = ["deepgram"] + (["whisper"] if args.whisper else [])
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    work = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="load-benchmark-")
+    ctx = {"work": work, "local": os.path.join(work, "local"), "blobs": os.path.join(work, "blobs"),
+           "db": os.path.join(work, "benchmark.db")}
+    os.makedirs(ctx["local"], exist_ok=True)
+    # The app writes app.log, frontend.log, uploads/ and its caches relative to the working directory
+    os.chdir(work)
+
+    from deepgram_stub import start_stub_server
+    deepgram = start_stub_server(latency=args.deepgram_latency)
+    os.environ.update(
+        DB_CONN_STR=f"Database={ctx['db']}",
+        AZURE_CONNECTION_STRING=AZURE_CONNECTION_STRING,
+        CONTAINER_NAME=CONTAINER,
+        LOCAL_FOLDER_PATH=ctx["local"],
+        DEEPGRAM_API_URL=deepgram.url,
+        DEEPGRAM_API_KEY="benchmark",
+        TRANSCRIPTION_CACHE_DIR=os.path.join(work, "transcription_cache"),
+    )
+    if args.whisper:
+        os.environ.setdefault("WHISPER_MODEL", "tiny")
+
+    # Everything below reads its settings at import time, so it is imported once the environment is set
+    import sqlite_odbc
+    sys.modules["pyodbc"] = sqlite_odbc
+    import blob_store
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    blob_store.install(AZURE_CONNECTION_STRING, ctx["blobs"], latency=args.blob_latency)
+    results = []
+    started = time.time()
+    # The app prints a line per file; keep stdout for the summary
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        audio_app = app_module.AudioServerApp()
+        server = make_server("127.0.0.1", 0, audio_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="load-benchmark-server", daemon=True).start()
+        client = Client(f"http://127.0.0.1:{server.server_port}")
+        try:
+            if args.whisper:
+                progress(f"Whisper warm-up: {json.dumps(app_module.warm_up(['whisper']))}")
+            for name in scenarios:
+                if name != "process_logs":
+                    results.extend(globals()[f"bench_{name}"](client, ctx, args))
+        finally:
+            server.shutdown()
+            audio_app.frontend_logs.stop()
+            audio_app.log_shipper.stop()
+            deepgram.shutdown()
+            if args.whisper:
+                import whisper_server
+                whisper_server.get_server().stop()
+        if "process_logs" in scenarios:
+            results.extend(bench_process_logs(ctx, args))
+
+    report = {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.time() - started, 1),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "workdir")},
+        "results": results,
+        # Sanity check that the requests really went through to the stand-ins
+        "database_rows": sqlite_odbc.table_counts(ctx["db"]),
+        "deepgram_requests": deepgram.requests_seen,
+    }
+    regressions = []
+    if baseline is not None:
+        report["comparison"] = compare(results, baseline, args.tolerance)
+        regressions = [c for c in report["comparison"] if c["regressed"]]
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if not args.workdir:
+        os.chdir(PYTHON_DIR)
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(json.dumps({"report": output, "results": len(results), "errors": sum(r["errors"] for r in results),
+                      "regressions": regressions}, indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
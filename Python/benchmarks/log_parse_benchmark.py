@@ -0,0 +1,117 @@
+"""Time the log ingester's line parsing on a large generated log file.
+
+"legacy" is the parser the ingester used before JSON logs: a regex plus up to
+two strptime calls per line, with frontend metadata recovered by splitting on
+" | Metadata:" and swapping quotes. "text" is the current parser on the same
+text-format lines, and "json" is the current parser on the same records
+written as JSON lines. Every variant parses the file into the row tuples
+insert_log_batch receives. Usage (from the Python/ directory):
+
+    python benchmarks/log_parse_benchmark.py --lines 1000000
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+import logger
+from json_logging import JsonFormatter, orjson
+
+LEGACY_PATTERN = r'^(?P<timestamp>[\d\-:\s,.]+) - (?P<level>\w+) - (?P<message>.*)$'
+
+
+def legacy_parse(line):
+    match = re.match(LEGACY_PATTERN, line)
+    if not match:
+        return None
+    ts_str = match.group('timestamp')
+    try:
+        timestamp = datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S,%f')
+    except ValueError:
+        try:
+            timestamp = datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return None
+    return timestamp, match.group('level'), match.group('message')
+
+
+def legacy_row(line):
+    parsed = legacy_parse(line.strip())
+    if not parsed:
+        return None
+    timestamp, level, raw_message = parsed
+    log_hash = logger.compute_log_hash(timestamp, level, raw_message)
+    message_text, metadata_json = raw_message, None
+    if " | Metadata:" in raw_message:
+        message_text, metadata_part = raw_message.split(" | Metadata:", 1)
+        message_text = message_text.strip()
+        try:
+            metadata_json = json.dumps(json.loads(metadata_part.strip().replace("'", '"')))
+        except json.JSONDecodeError:
+            metadata_json = None
+    return (timestamp, level, message_text, metadata_json, log_hash)
+
+
+def write_logs(directory, count):
+    """The same records as old-style text lines and as JSON lines."""
+    text_path = os.path.join(directory, "frontend.log")
+    json_path = os.path.join(directory, "frontend.jsonl")
+    text_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    json_formatter = JsonFormatter()
+    started = datetime(2025, 5, 22, 15, 22, 30)
+    levels = [(logging.INFO, "INFO"), (logging.WARNING, "WARNING"), (logging.ERROR, "ERROR")]
+    with open(text_path, "w", encoding="utf-8") as text_file, open(json_path, "w", encoding="utf-8") as json_file:
+        for i in range(count):
+            levelno, _ = levels[i % len(levels)]
+            metadata = {"page": "/dashboard", "user": i % 97, "durationMs": i % 1000}
+            message = f"Rendered component {i % 50}"
+            text_record = logging.LogRecord("frontendLogger", levelno, "", 0,
+                                            f"{message} | Metadata:{metadata}", None, None)
+            json_record = logging.LogRecord("frontendLogger", levelno, "", 0, message, None, None)
+            json_record.metadata = metadata
+            text_record.created = json_record.created = (started + timedelta(milliseconds=i)).timestamp()
+            text_record.msecs = json_record.msecs = i % 1000
+            text_file.write(text_formatter.format(text_record) + "\n")
+            json_file.write(json_formatter.format(json_record) + "\n")
+    return text_path, json_path
+
+
+def measure(path, build_row):
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    started = time.perf_counter()
+    rows = sum(1 for line in lines if build_row(line))
+    seconds = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(seconds, 3), "lines_per_second": int(len(lines) / seconds)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path, json_path = write_logs(tmp, args.lines)
+        current_row = lambda line: logger._build_log_row(line, has_metadata=True)
+        report = {
+            "lines": args.lines,
+            "orjson": orjson is not None,
+            "legacy": measure(text_path, legacy_row),
+            "text": measure(text_path, current_row),
+            "json": measure(json_path, current_row),
+        }
+    for name in ("text", "json"):
+        report[f"{name}_speedup"] = round(report["legacy"]["seconds"] / report[name]["seconds"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
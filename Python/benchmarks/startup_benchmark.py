@@ -0,0 +1,81 @@
+"""Measure how long the Flask app takes to become ready to serve.
+
+"lazy" is the current startup: import app and build AudioServerApp, with every
+model backend deferred until first use. "eager" reproduces the old startup on
+top of that by importing the Azure SDK and Deepgram module and loading the
+Whisper model in the web process, as app.py/audio.py used to at import time.
+
+Each scenario runs in a fresh interpreter so import caches do not leak between
+runs. Usage (from the Python/ directory):
+
+    python benchmarks/startup_benchmark.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = """
+import time
+started = time.perf_counter()
+import app
+app.AudioServerApp()
+print("STARTUP_SECONDS", time.perf_counter() - started)
+"""
+
+EAGER = """
+import os, time
+started = time.perf_counter()
+import app
+app.AudioServerApp()
+import azure.storage.blob
+import DeepTranscript
+import whisper
+whisper.load_model(os.getenv("WHISPER_MODEL", "base"))
+print("STARTUP_SECONDS", time.perf_counter() - started)
+"""
+
+
+def run_once(code):
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=PYTHON_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    # The app prints its own chatter to stdout too, so look for our marker line
+    for line in completed.stdout.splitlines():
+        if line.startswith("STARTUP_SECONDS "):
+            return float(line.split()[1])
+    raise RuntimeError("No timing found in benchmark output")
+
+
+def measure(code, runs):
+    try:
+        timings = [run_once(code) for _ in range(runs)]
+    except RuntimeError as e:
+        return {"error": str(e)}
+    return {
+        "runs": runs,
+        "median_seconds": round(statistics.median(timings), 3),
+        "min_seconds": round(min(timings), 3),
+        "max_seconds": round(max(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"lazy": measure(LAZY, args.runs), "eager": measure(EAGER, args.runs)}
+    if "median_seconds" in report["lazy"] and "median_seconds" in report["eager"]:
+        report["speedup"] = round(report["eager"]["median_seconds"] / report["lazy"]["median_seconds"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Real-time factor of Whisper transcription with and without pre-processing.
+
+"raw" sends the whole file to the Whisper pool as before. "preprocessed" decodes
+it once, drops silence and transcribes the remaining speech as parallel
+segments (audio.transcribe_segments). RTF is processing seconds per second of
+audio, so lower is better. Without file arguments a synthetic call with long
+silent stretches is generated. Usage (from the Python/ directory):
+
+    WHISPER_WORKERS=4 python benchmarks/whisper_rtf_benchmark.py calls/*.wav
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+import numpy as np
+import preprocess
+
+
+def synthetic_call(path, minutes, sample_rate=preprocess.SAMPLE_RATE):
+    """Alternate 20s of speech-like noise with 40s of near silence."""
+    rng = np.random.default_rng(0)
+    pieces = []
+    for _ in range(int(minutes)):
+        envelope = 0.5 + 0.5 * np.sin(np.linspace(0, 40 * np.pi, 20 * sample_rate))
+        pieces.append(0.2 * envelope * rng.standard_normal(20 * sample_rate))
+        pieces.append(0.0005 * rng.standard_normal(40 * sample_rate))
+    audio = np.clip(np.concatenate(pieces), -1, 1)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((audio * 32767).astype(np.int16).tobytes())
+
+
+def measure(fn, path, duration):
+    started = time.perf_counter()
+    try:
+        fn(path)
+    except Exception as e:
+        return {"error": str(e)}
+    seconds = time.perf_counter() - started
+    return {"seconds": round(seconds, 3), "rtf": round(seconds / duration, 4) if duration else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--minutes", type=float, default=5, help="length of the synthetic call")
+    parser.add_argument("--skip-raw", action="store_true", help="only run the pre-processed path")
+    args = parser.parse_args()
+
+    import audio
+    from whisper_server import warm_up
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files
+        if not files:
+            files = [os.path.join(tmp, "synthetic_call.wav")]
+            synthetic_call(files[0], args.minutes)
+
+        server = warm_up()
+        report = {"workers": server.workers, "model": server.model_name, "files": []}
+        for path in files:
+            started = time.perf_counter()
+            samples, segments, duration = preprocess.prepare(path)
+            prepare_seconds = time.perf_counter() - started
+            kept = sum(end - start for start, end in segments) / preprocess.SAMPLE_RATE
+            entry = {
+                "file": os.path.basename(path),
+                "duration_seconds": round(duration, 1),
+                "speech_seconds": round(kept, 1),
+                "segments": len(segments),
+                "prepare_seconds": round(prepare_seconds, 3),
+                "preprocessed": measure(audio.transcribe_segments, path, duration),
+            }
+            if not args.skip_raw:
+                entry["raw"] = measure(server.transcribe, path, duration)
+                if "rtf" in entry["raw"] and entry["preprocessed"].get("rtf"):
+                    entry["speedup"] = round(entry["raw"]["rtf"] / entry["preprocessed"]["rtf"], 1)
+            report["files"].append(entry)
+        server.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pyodbc
+from dotenv import load_dotenv
+from metrics import histogram
+
+load_dotenv()
+DB_CONN_STR = os.getenv("DB_CONN_STR")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))         # seconds before an idle connection is closed
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))  # seconds to wait when the pool is exhausted
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))  # ping connections idle longer than this
+
+
+CHECKOUT_WAIT_SECONDS = histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a free connection")
+CONNECT_SECONDS = histogram("db_connect_seconds", "Time to open a new SQL Server connection")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of pyodbc connections.
+
+    Connections idle for longer than `health_check_after` seconds are pinged with
+    SELECT 1 on checkout and replaced if dead. Connections above `min_size` that
+    sit idle for `idle_timeout` seconds are closed. When all `max_size`
+    connections are in use, callers wait up to `checkout_timeout` seconds.
+    """
+
+    def __init__(self, conn_str, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 idle_timeout=DB_POOL_IDLE_TIMEOUT, checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                 health_check_after=DB_POOL_HEALTH_CHECK_AFTER):
+        self.conn_str = conn_str
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self._idle = []          # (connection, returned_at), most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "closed": 0,
+            "evicted": 0,
+            "failed_health_checks": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block.
+
+        If the block raises, the transaction is rolled back and a connection that
+        cannot even roll back is thrown away instead of being returned.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            discard = False
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            self.release(conn, discard=discard)
+            raise
+        else:
+            self.release(conn)
+
+    def acquire(self, timeout=None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            evicted = self._evict_idle()
+        for stale in evicted:
+            self._close(stale)
+
+        with self._cond:
+            if not self._idle and self._in_use >= self.max_size:
+                self._stats["exhausted"] += 1
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No database connection available within {timeout}s")
+                self._cond.wait(remaining)
+            waited = time.monotonic() - started
+            CHECKOUT_WAIT_SECONDS.observe(waited)
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._in_use += 1
+            idle = self._idle.pop() if self._idle else None
+
+        # Connecting and pinging happen outside the lock so slow I/O never blocks other threads
+        try:
+            if idle:
+                conn, returned_at = idle
+                if time.monotonic() - returned_at < self.health_check_after or self._is_alive(conn):
+                    return conn
+                with self._cond:
+                    self._stats["failed_health_checks"] += 1
+                self._close(conn)
+            with CONNECT_SECONDS.time():
+                conn = pyodbc.connect(self.conn_str)
+            with self._cond:
+                self._stats["created"] += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+        stats["max_size"] = self.max_size
+        return stats
+
+    def _evict_idle(self):
+        # Called with the lock held; oldest connections sit at the front of the list.
+        # Returns the evicted connections so the caller can close them outside the lock.
+        now = time.monotonic()
+        evicted = []
+        while (self._idle and len(self._idle) + self._in_use > self.min_size
+               and now - self._idle[0][1] > self.idle_timeout):
+            conn, _ = self._idle.pop(0)
+            self._stats["evicted"] += 1
+            evicted.append(conn)
+        return evicted
+
+    def _is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide pool for DB_CONN_STR, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONN_STR)
+    return _pool
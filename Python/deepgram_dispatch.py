@@ -0,0 +1,164 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from dotenv import load_dotenv
+from metrics import counter
+from DeepTranscript import analyze_audio_with_deepgram, DeepgramError, DEEPGRAM_CONCURRENCY
+
+load_dotenv()
+DEEPGRAM_RATE_LIMIT = float(os.getenv("DEEPGRAM_RATE_LIMIT", "10"))          # requests per second, 0 = unlimited
+DEEPGRAM_RATE_BURST = int(os.getenv("DEEPGRAM_RATE_BURST", str(DEEPGRAM_CONCURRENCY)))
+DEEPGRAM_MAX_RETRIES = int(os.getenv("DEEPGRAM_MAX_RETRIES", "4"))
+DEEPGRAM_BACKOFF_BASE = float(os.getenv("DEEPGRAM_BACKOFF_BASE", "0.5"))     # seconds before the first retry
+DEEPGRAM_BACKOFF_MAX = float(os.getenv("DEEPGRAM_BACKOFF_MAX", "30"))
+DEEPGRAM_FILE_TIMEOUT = float(os.getenv("DEEPGRAM_FILE_TIMEOUT", "600"))     # seconds per file, retries included
+
+
+DISPATCH_EVENTS = counter("deepgram_dispatch_events_total", "Deepgram calls, retries, failures and 429s",
+                          ("event",))
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Block until a token is available; return False if `deadline` (monotonic) passes first."""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class DeepgramDispatcher:
+    """Sends Deepgram requests concurrently, within a rate limit, retrying transient failures.
+
+    Every call takes a token from a shared bucket, so the limit holds across
+    threads (sync batches, the job queue) alike. 429s, 5xx responses and
+    connection errors are retried with exponential backoff and jitter, honouring
+    Retry-After; a file gives up once `file_timeout` seconds have passed.
+    """
+
+    def __init__(self, max_concurrency=DEEPGRAM_CONCURRENCY, rate=DEEPGRAM_RATE_LIMIT, burst=DEEPGRAM_RATE_BURST,
+                 max_retries=DEEPGRAM_MAX_RETRIES, backoff_base=DEEPGRAM_BACKOFF_BASE,
+                 backoff_max=DEEPGRAM_BACKOFF_MAX, file_timeout=DEEPGRAM_FILE_TIMEOUT, transcribe_fn=None):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.file_timeout = file_timeout
+        self.transcribe_fn = transcribe_fn or analyze_audio_with_deepgram
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="deepgram")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rate_limited": 0}
+
+    def transcribe(self, audio_url=None, file_path=None):
+        """One file, rate-limited and retried. Same arguments and result as analyze_audio_with_deepgram."""
+        deadline = time.monotonic() + self.file_timeout
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(deadline):
+                self._count("failures")
+                raise TimeoutError(f"Deepgram rate limit: no slot within {self.file_timeout}s")
+            self._count("requests")
+            try:
+                remaining = deadline - time.monotonic()
+                return self.transcribe_fn(audio_url=audio_url, file_path=file_path, timeout=max(remaining, 1))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or time.monotonic() + delay >= deadline:
+                    self._count("failures")
+                    raise
+                logging.warning(f"Deepgram call failed ({e}), retry {attempt + 1} in {delay:.2f}s")
+                self._count("retries")
+                time.sleep(delay)
+                attempt += 1
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on one of the dispatcher's threads and return its Future."""
+        return self._executor.submit(fn, *args)
+
+    def map(self, fn, items):
+        """Run fn over items on the dispatcher's threads and return the results in input order.
+
+        Raises the first error in input order, once every item has finished.
+        """
+        futures = [self.submit(fn, item) for item in items]
+        errors = [f.exception() for f in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [f.result() for f in futures]
+
+    def transcribe_many(self, file_paths):
+        return self.map(lambda path: self.transcribe(file_path=path), file_paths)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_concurrency=self.max_concurrency, rate_limit=self.bucket.rate)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying `error`, or None if it should not be retried."""
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, DeepgramError):
+            if error.status_code == 429:
+                self._count("rate_limited")
+            elif error.status_code is None or error.status_code < 500:
+                return None
+            if error.retry_after is not None:
+                return min(error.retry_after, self.backoff_max)
+        elif not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return None
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+        DISPATCH_EVENTS.inc(event=name)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, created on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = DeepgramDispatcher()
+    return _dispatcher
+
+
+def transcribe(file_path=None, audio_url=None):
+    # The scheduler always passes the staged file; a URL means Deepgram fetches it itself
+    if audio_url:
+        file_path = None
+    return get_dispatcher().transcribe(audio_url=audio_url, file_path=file_path)
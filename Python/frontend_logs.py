@@ -0,0 +1,196 @@
+import os
+import json
+import zlib
+import time
+import logging
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+from json_logging import LOG_FORMAT, loads
+from metrics import counter
+
+load_dotenv()
+FRONTEND_LOG_MAX_BATCH = int(os.getenv("FRONTEND_LOG_MAX_BATCH", "500"))              # records per request
+FRONTEND_LOG_MAX_BODY = int(os.getenv("FRONTEND_LOG_MAX_BODY", str(1024 * 1024)))     # bytes, after gunzip
+FRONTEND_LOG_MAX_MESSAGE = int(os.getenv("FRONTEND_LOG_MAX_MESSAGE", "8192"))         # characters
+FRONTEND_LOG_BUFFER_RECORDS = int(os.getenv("FRONTEND_LOG_BUFFER_RECORDS", "1000"))   # flush at this many
+FRONTEND_LOG_BUFFER_BYTES = int(os.getenv("FRONTEND_LOG_BUFFER_BYTES", str(256 * 1024)))
+FRONTEND_LOG_FLUSH_INTERVAL = float(os.getenv("FRONTEND_LOG_FLUSH_INTERVAL", "2"))    # seconds a record may wait
+
+# The Client's console method names as well as logging's level names
+LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "LOG": logging.INFO,
+    "INFO": logging.INFO,
+    "WARN": logging.WARNING,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+RECORDS = counter("frontend_log_records_total", "Frontend log records by outcome", ("outcome",))
+
+
+class InvalidLogBatch(ValueError):
+    pass
+
+
+class BatchTooLarge(InvalidLogBatch):
+    pass
+
+
+def read_body(data, content_encoding=None, max_size=FRONTEND_LOG_MAX_BODY):
+    """Decode a (possibly gzip-encoded) JSON body into a list of records."""
+    if (content_encoding or "").lower() == "gzip":
+        # Bounded so a small gzip bomb cannot expand into gigabytes
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(data, max_size + 1)
+        except zlib.error as e:
+            raise InvalidLogBatch(f"Invalid gzip body: {e}") from e
+    if len(data) > max_size:
+        raise BatchTooLarge(f"Body is larger than {max_size} bytes")
+    try:
+        body = loads(data)
+    except ValueError as e:
+        raise InvalidLogBatch(f"Invalid JSON body: {e}") from e
+    records = body.get("logs") if isinstance(body, dict) else body
+    if not isinstance(records, list):
+        raise InvalidLogBatch('Expected a JSON array of records or {"logs": [...]}')
+    if len(records) > FRONTEND_LOG_MAX_BATCH:
+        raise BatchTooLarge(f"At most {FRONTEND_LOG_MAX_BATCH} records per request")
+    return records
+
+
+def build_record(log, logger):
+    """Turn one Client record into a LogRecord for `logger`; raises InvalidLogBatch if it is malformed.
+
+    A valid "timestamp" from the Client is kept, so resending a batch produces
+    the same lines and the ingester's LogHash drops the duplicates.
+    """
+    if not isinstance(log, dict):
+        raise InvalidLogBatch("Record must be an object")
+    message = log.get("message")
+    if not isinstance(message, str) or not message:
+        raise InvalidLogBatch("message must be a non-empty string")
+    if len(message) > FRONTEND_LOG_MAX_MESSAGE:
+        raise InvalidLogBatch(f"message is longer than {FRONTEND_LOG_MAX_MESSAGE} characters")
+    level = LEVELS.get(str(log.get("level", "INFO")).upper())
+    if level is None:
+        raise InvalidLogBatch(f"Unknown level {log.get('level')!r}")
+    metadata = log.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise InvalidLogBatch("metadata must be an object")
+
+    if LOG_FORMAT != "json":
+        message = f"{message} | Metadata:{json.dumps(metadata)}"
+    record = logger.makeRecord(logger.name, level, "(frontend)", 0, message, None, None,
+                               extra={"metadata": metadata})
+    timestamp = log.get("timestamp")
+    if timestamp:
+        if not isinstance(timestamp, str):
+            raise InvalidLogBatch(f"Invalid timestamp {timestamp!r}")
+        try:
+            # toISOString() ends in "Z", which fromisoformat only accepts from Python 3.11.
+            # Stored as server-local time, like every other log line
+            created = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            raise InvalidLogBatch(f"Invalid timestamp {timestamp!r}")
+        record.created, record.msecs = created, (created % 1) * 1000
+    return record
+
+
+class FrontendLogBuffer:
+    """Collects frontend log lines and appends them to the log file in one write.
+
+    A flush happens once `max_records` lines or `max_bytes` are waiting, or
+    `max_latency` seconds after the oldest line arrived, whichever is first, so
+    memory and delay are both bounded. `on_flush` runs after every write (the
+    app uses it to nudge the log shipper).
+    """
+
+    def __init__(self, handler, max_records=FRONTEND_LOG_BUFFER_RECORDS, max_bytes=FRONTEND_LOG_BUFFER_BYTES,
+                 max_latency=FRONTEND_LOG_FLUSH_INTERVAL, on_flush=None):
+        self.handler = handler
+        self.max_records = max(max_records, 1)
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.on_flush = on_flush
+        self._lines = []
+        self._bytes = 0
+        self._deadline = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._stats = {"flushes": 0, "lines_written": 0}
+
+    def add(self, records):
+        lines = [self.handler.format(record) + "\n" for record in records]
+        if not lines:
+            return
+        with self._cond:
+            was_empty = not self._lines
+            self._lines.extend(lines)
+            self._bytes += sum(len(line) for line in lines)
+            full = len(self._lines) >= self.max_records or self._bytes >= self.max_bytes
+            if was_empty and not full:
+                # The first waiting line sets the deadline for the whole batch
+                self._deadline = time.monotonic() + self.max_latency
+                self._start()
+                self._cond.notify()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._cond:
+            lines, self._lines, self._bytes = self._lines, [], 0
+        if not lines:
+            return 0
+        # Through the handler's own stream and lock, so lines from frontend_logger never interleave
+        self.handler.acquire()
+        try:
+            self.handler.stream.write("".join(lines))
+            self.handler.flush()
+        finally:
+            self.handler.release()
+        with self._cond:
+            self._stats["flushes"] += 1
+            self._stats["lines_written"] += len(lines)
+        if self.on_flush:
+            self.on_flush()
+        return len(lines)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, buffered=len(self._lines), buffered_bytes=self._bytes)
+
+    def _start(self):
+        # Called with the lock held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="frontend-log-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._lines and not self._stopping:
+                    self._cond.wait()
+                # Lines added meanwhile do not wake this thread; a flush from add() empties the buffer
+                while self._lines and not self._stopping:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Could not write frontend logs: {e}")
@@ -0,0 +1,32 @@
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Parse a single-range `Range: bytes=...` header against a resource of `size` bytes.
+
+    Returns an inclusive (start, end) tuple, or None when the header is absent,
+    malformed or asks for several ranges (the caller then sends the whole body).
+    Raises RangeNotSatisfiable when the range lies entirely past the end.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_str, sep, end_str = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # Suffix range: the last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,339 @@
+"""Back-fill transcriptions for a whole archive of recordings.
+
+Scans LOCAL_FOLDER_PATH (or --folder) or an Azure container prefix and
+transcribes every recording whose audio is not in AudioDetails yet, on a pool
+of workers through the same backend scheduler the app uses. Rows are written
+in batches, each batch in one transaction, and every file is then appended to
+a checkpoint file, so an interrupted run picks up where it stopped. Usage
+(from the Python/ directory):
+
+    python ingest.py --source local --model deepgram --workers 8
+    python ingest.py --source azure --prefix 2025/03/ --model whisper --checkpoint march.jsonl
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+from backends import REGISTRY, backend_params, get_scheduler
+from db_pool import get_pool
+from staging import hash_file, stage_blob
+from transcription_cache import TranscriptionCache, AUDIO_DETAILS_TABLE, AUDIO_HASH_COLUMN
+from json_logging import make_formatter
+
+load_dotenv()
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))               # files in flight at once
+INGEST_DB_BATCH_SIZE = int(os.getenv("INGEST_DB_BATCH_SIZE", "50"))  # files per DB transaction
+INGEST_EXTENSIONS = os.getenv("INGEST_EXTENSIONS", "mp3,wav")
+
+INGESTED, SKIPPED, FAILED = "ingested", "skipped", "failed"
+
+
+class Checkpoint:
+    """Append-only JSON lines, one {"name", "status", "hash"[, "error"]} per finished file.
+
+    Lines are only written once a file's rows are committed. A line cut short
+    by a crash is ignored, and that file is simply processed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.done[entry["name"]] = entry
+                    except (ValueError, KeyError):
+                        continue
+
+    def pending(self, names, retry_failed=False):
+        return [name for name in names
+                if name not in self.done or (retry_failed and self.done[name]["status"] == FAILED)]
+
+    def record(self, entries):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update((entry["name"], entry) for entry in entries)
+
+
+class LocalSource:
+    def __init__(self, folder, extensions):
+        self.folder = folder
+        self.extensions = extensions
+
+    def list(self):
+        names = []
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                if filename.lower().endswith(self.extensions):
+                    names.append(os.path.relpath(os.path.join(root, filename), self.folder).replace(os.sep, "/"))
+        return sorted(names)
+
+    def location(self, name):
+        return os.path.join(self.folder, name)
+
+    def stage(self, name, staging_dir):
+        # Read in place: nothing to copy, and nothing to clean up afterwards
+        path = self.location(name)
+        return path, hash_file(path), False
+
+
+class AzureSource:
+    def __init__(self, connection_string, container, prefix, extensions):
+        # Imported here so a local run never loads the Azure SDK
+        from azure_client import get_blob_service_client
+        self.client = get_blob_service_client(connection_string).get_container_client(container)
+        self.prefix = prefix or None
+        self.extensions = extensions
+
+    def list(self):
+        return sorted(blob.name for blob in self.client.list_blobs(name_starts_with=self.prefix)
+                      if blob.name.lower().endswith(self.extensions))
+
+    def location(self, name):
+        return self.client.get_blob_client(name).url
+
+    def stage(self, name, staging_dir):
+        path = os.path.join(staging_dir, hashlib.sha256(name.encode()).hexdigest() + os.path.splitext(name)[1])
+        return path, stage_blob(self.client.get_blob_client(name), path), True
+
+
+def check_schema():
+    """Fail once, up front, if AudioDetails cannot be queried by hash (see AUDIO_HASH_COLUMN)."""
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT TOP 0 {AUDIO_HASH_COLUMN} FROM {AUDIO_DETAILS_TABLE}")
+        cursor.fetchall()
+        cursor.close()
+
+
+def audio_exists(file_hash):
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT 1 FROM {AUDIO_DETAILS_TABLE} WHERE {AUDIO_HASH_COLUMN} = ?", (file_hash,))
+        row = cursor.fetchone()
+        cursor.close()
+    return row is not None
+
+
+def write_batch(rows):
+    """Insert the audio and transcription rows of several files in one transaction."""
+    audio_rows = [row["audio"] for row in rows]
+    transcription_rows = [row["transcription"] for row in rows]
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("EXEC InsertAudioDetailsIfNotExists ?, ?, ?, ?, ?, ?", audio_rows)
+        cursor.executemany("EXEC InsertTranscriptionResult ?, ?, ?, ?, ?, ?, ?", transcription_rows)
+        conn.commit()
+        cursor.close()
+
+
+class Ingester:
+    """Runs the files of a source through stage -> hash -> skip check -> transcribe -> batched DB write.
+
+    Workers stage and transcribe; the calling thread collects their results,
+    writes them `batch_size` files at a time and then checkpoints those files.
+    Only transcribed files get an AudioDetails row, so a file that failed is
+    not mistaken for done on the next run. Results also go to the transcription
+    cache, so files transcribed but not yet written when a run is interrupted
+    are not paid for twice.
+    """
+
+    def __init__(self, source, model, checkpoint, workers=INGEST_WORKERS, batch_size=INGEST_DB_BATCH_SIZE,
+                 staging_dir=None, entity_id=1):
+        self.source = source
+        self.model = model
+        self.checkpoint = checkpoint
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self.staging_dir = staging_dir
+        self.entity_id = entity_id
+        self.scheduler = get_scheduler()
+        self.cache = TranscriptionCache()
+        self._seen = {}         # hash -> Future(done ok?) of the file that claimed it during this run
+        self._lock = threading.Lock()
+        self.counts = {INGESTED: 0, SKIPPED: 0, FAILED: 0}
+
+    def run(self, names):
+        started = time.monotonic()
+        pending_rows, pending_entries = [], []
+        in_flight = set()
+        names = iter(names)
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest") as pool:
+            try:
+                while True:
+                    # Keep a bounded number of files in flight rather than queueing the whole archive
+                    while not exhausted and len(in_flight) < 2 * self.workers:
+                        name = next(names, None)
+                        if name is None:
+                            exhausted = True
+                        else:
+                            in_flight.add(pool.submit(self.process, name))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        entry, row = future.result()
+                        pending_entries.append(entry)
+                        if row:
+                            pending_rows.append(row)
+                        self.counts[entry["status"]] += 1
+                    if len(pending_entries) >= self.batch_size:
+                        self.flush(pending_rows, pending_entries, started)
+            except KeyboardInterrupt:
+                print("Interrupted: saving finished files; run again to resume.")
+                for future in in_flight:
+                    future.cancel()
+                raise
+            finally:
+                self.flush(pending_rows, pending_entries, started)
+        return dict(self.counts, seconds=round(time.monotonic() - started, 1))
+
+    def flush(self, rows, entries, started):
+        if not entries:
+            return
+        if rows:
+            write_batch(rows)
+        self.checkpoint.record(entries)
+        done = sum(self.counts.values())
+        rate = done / max(time.monotonic() - started, 1e-9)
+        print(f"{done} files: {self.counts[INGESTED]} ingested, {self.counts[SKIPPED]} skipped, "
+              f"{self.counts[FAILED]} failed ({rate:.2f} files/s)")
+        rows.clear()
+        entries.clear()
+
+    def process(self, name):
+        """Returns (checkpoint entry, DB rows or None) and never raises."""
+        path, staged, claim = None, False, None
+        try:
+            path, file_hash, staged = self.source.stage(name, self.staging_dir)
+            if not self._claim(file_hash):
+                return {"name": name, "status": SKIPPED, "hash": file_hash}, None
+            claim = file_hash
+            if audio_exists(file_hash):
+                self._seen[claim].set_result(True)
+                return {"name": name, "status": SKIPPED, "hash": file_hash}, None
+
+            params = backend_params(self.model)
+            result = self.cache.get(file_hash, self.model, params)
+            backend_name = self.model
+            if result is None:
+                backend_name, result = self.scheduler.run(self.model, path)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                self.cache.put(file_hash, backend_name, result, backend_params(backend_name))
+
+            transcription = result["transcription"]
+            now = datetime.datetime.now()
+            row = {
+                "audio": (self.entity_id, name, self.source.location(name), file_hash, now, now),
+                "transcription": (self.entity_id, backend_name, name,
+                                  hashlib.sha256(transcription.encode()).hexdigest(), transcription, now, now),
+            }
+            self._seen[claim].set_result(True)
+            return {"name": name, "status": INGESTED, "hash": file_hash, "model": backend_name}, row
+        except Exception as e:
+            logging.error(f"Ingesting {name} failed: {e}\n{traceback.format_exc()}")
+            if claim:
+                # Copies of the same audio, waiting or still to come, get their own attempt
+                with self._lock:
+                    self._seen.pop(claim).set_result(False)
+            return {"name": name, "status": FAILED, "error": str(e)}, None
+        finally:
+            if staged and path and os.path.exists(path):
+                os.remove(path)
+
+    def _claim(self, file_hash):
+        """True if this file is the one to transcribe its audio, False if a copy already has.
+
+        A copy of audio another worker is still on waits for that outcome, so it
+        is only skipped once the other file has actually been transcribed.
+        """
+        while True:
+            with self._lock:
+                claim = self._seen.get(file_hash)
+                if claim is None:
+                    self._seen[file_hash] = Future()
+                    return True
+            if claim.result():
+                return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("local", "azure"), default="local")
+    parser.add_argument("--folder", default=os.getenv("LOCAL_FOLDER_PATH"), help="for --source local")
+    parser.add_argument("--container", default=os.getenv("CONTAINER_NAME"), help="for --source azure")
+    parser.add_argument("--prefix", default="", help="only blobs whose name starts with this")
+    parser.add_argument("--model", default="deepgram", choices=sorted(REGISTRY))
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_DB_BATCH_SIZE, help="files per DB transaction")
+    parser.add_argument("--extensions", default=INGEST_EXTENSIONS)
+    parser.add_argument("--checkpoint", help="progress file (default: ingest-<source>-<model>.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="try files that failed in earlier runs again")
+    parser.add_argument("--limit", type=int, help="process at most this many files this run")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be processed")
+    args = parser.parse_args(argv)
+
+    handler = logging.FileHandler("ingest.log")
+    handler.setFormatter(make_formatter())
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    extensions = tuple(f".{e.strip().lstrip('.').lower()}" for e in args.extensions.split(",") if e.strip())
+    if args.source == "local":
+        if not args.folder or not os.path.isdir(args.folder):
+            parser.error("--folder (or LOCAL_FOLDER_PATH) must be an existing directory")
+        source = LocalSource(args.folder, extensions)
+    else:
+        if not args.container:
+            parser.error("--container (or CONTAINER_NAME) is required")
+        source = AzureSource(os.getenv("AZURE_CONNECTION_STRING"), args.container, args.prefix, extensions)
+
+    checkpoint = Checkpoint(args.checkpoint or f"ingest-{args.source}-{args.model}.jsonl")
+    names = source.list()
+    pending = checkpoint.pending(names, args.retry_failed)[:args.limit]
+    print(f"{len(names)} recordings found, {len(names) - len(pending)} already done, {len(pending)} to process.")
+    if args.dry_run or not pending:
+        return 0
+    try:
+        check_schema()
+    except Exception as e:
+        logging.error(f"Schema check failed: {e}\n{traceback.format_exc()}")
+        print(f"Cannot look up {AUDIO_DETAILS_TABLE}.{AUDIO_HASH_COLUMN}: {e}\n"
+              f"Set AUDIO_DETAILS_TABLE / AUDIO_HASH_COLUMN to match the database.")
+        return 1
+
+    staging_dir = tempfile.mkdtemp(prefix="ingest-")
+    try:
+        ingester = Ingester(source, args.model, checkpoint, args.workers, args.batch_size, staging_dir)
+        try:
+            summary = ingester.run(pending)
+        except KeyboardInterrupt:
+            return 130
+        except Exception as e:
+            # e.g. the database went away; finished batches are checkpointed, so a rerun resumes
+            logging.error(f"Ingestion stopped: {e}\n{traceback.format_exc()}")
+            print(f"Ingestion stopped: {e}")
+            return 1
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    print(json.dumps(summary))
+    return 1 if summary[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "2"))   # files transcribed at the same time
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "200"))           # finished jobs kept for polling
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class TranscriptionJob:
+    def __init__(self, model, sources):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.created_at = time.time()
+        self.finished_at = None
+        self.files = [
+            {
+                "filename": filename,
+                "source": source,
+                "file_hash": file_hash,
+                "status": QUEUED,
+                "transcription": None,
+                "error": None,
+                "started_at": None,
+                "finished_at": None,
+            }
+            for filename, source, file_hash in sources
+        ]
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        statuses = {f["status"] for f in self.files}
+        if statuses <= {QUEUED}:
+            return QUEUED
+        if statuses & {QUEUED, RUNNING}:
+            return RUNNING
+        return FAILED if statuses == {FAILED} else DONE
+
+    def update_file(self, index, **changes):
+        with self._lock:
+            self.files[index].update(changes)
+            if self.finished_at is None and all(f["status"] in (DONE, FAILED) for f in self.files):
+                self.finished_at = time.time()
+
+    def results(self):
+        """Finished transcriptions in the same shape /api/process-audio returns."""
+        with self._lock:
+            return [
+                {"filename": f["filename"], "transcription": f["transcription"]}
+                for f in self.files if f["status"] == DONE
+            ]
+
+    def to_dict(self):
+        with self._lock:
+            files = [{k: v for k, v in f.items() if k not in ("source", "file_hash")} for f in self.files]
+            finished_at = self.finished_at
+        completed = sum(1 for f in files if f["status"] in (DONE, FAILED))
+        return {
+            "job_id": self.id,
+            "model": self.model,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": finished_at,
+            "progress": {"completed": completed, "total": len(files)},
+            "files": files,
+        }
+
+
+class JobManager:
+    """In-process transcription queue.
+
+    `process_file(model, filename, source, file_hash)` is called on a worker
+    thread for every file and must return the model result dict (with a
+    "transcription" key).
+    Files from one job are spread across the pool, so a batch is transcribed
+    concurrently rather than one after another. The same recording may then be
+    processed by two threads at once (listed twice, or in two jobs), so
+    process_file must not share scratch files between calls; the app's stages
+    every call to a path of its own.
+    """
+
+    def __init__(self, process_file, max_workers=TRANSCRIPTION_WORKERS, history_size=JOB_HISTORY_SIZE):
+        self.process_file = process_file
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcribe")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, model, sources):
+        """Queue a job for (filename, source, file_hash) triples and return it immediately."""
+        job = TranscriptionJob(model, sources)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        for index in range(len(job.files)):
+            self._executor.submit(self._run_file, job, index)
+        logging.info(f"Queued job {job.id} with {len(job.files)} file(s) for model: {model}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            {"job_id": j.id, "model": j.model, "status": j.status, "created_at": j.created_at}
+            for j in reversed(jobs)
+        ]
+
+    def file_counts(self):
+        """Files per status across the jobs still in history."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in jobs:
+            with job._lock:
+                for f in job.files:
+                    counts[f["status"]] += 1
+        return counts
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run_file(self, job, index):
+        file_info = job.files[index]
+        job.update_file(index, status=RUNNING, started_at=time.time())
+        try:
+            result = self.process_file(
+                job.model, file_info["filename"], file_info["source"], file_info["file_hash"])
+            job.update_file(index, status=DONE, transcription=result["transcription"], finished_at=time.time())
+        except Exception as e:
+            logging.error(f"Job {job.id} failed on {file_info['filename']}: {e}\n{traceback.format_exc()}")
+            job.update_file(index, status=FAILED, error=str(e), finished_at=time.time())
+
+    def _trim_history(self):
+        # Drop the oldest finished jobs; running jobs are never evicted
+        excess = len(self._jobs) - self.history_size
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (DONE, FAILED):
+                del self._jobs[job_id]
+                excess -= 1
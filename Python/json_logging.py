@@ -0,0 +1,55 @@
+import os
+import json
+import logging
+from datetime import datetime
+from dotenv import load_dotenv
+
+try:
+    # Several times faster than the json module; optional
+    import orjson
+except ImportError:
+    orjson = None
+
+load_dotenv()
+# "json" writes one JSON object per line; "text" keeps the old "<time> - <LEVEL> - <message>" lines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj, default=str).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":"))
+
+    loads = json.loads
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: {"ts", "level", "logger", "message"[, "metadata", "exc"]}.
+
+    `metadata` comes from `extra={"metadata": {...}}` and is kept as a real
+    object, so nothing has to be recovered from the message text later.
+    Timestamps are local ISO-8601 with milliseconds, like the text format.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        metadata = getattr(record, "metadata", None)
+        if metadata is not None:
+            entry["metadata"] = metadata
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry)
+
+
+def make_formatter(log_format=None):
+    return JsonFormatter() if (log_format or LOG_FORMAT) == "json" else logging.Formatter(TEXT_FORMAT)
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import base64
+import bisect
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+FILE_LISTING_TTL = float(os.getenv("FILE_LISTING_TTL", "60"))   # seconds before a listing is re-read
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+SORT_KEYS = {
+    "name": lambda item: (item["name"],),
+    "date": lambda item: (item["last_modified"], item["name"]),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+class ListingIndex:
+    """In-memory index of the audio files in one location.
+
+    `loader()` returns dicts with at least "name", "size" and "last_modified"
+    (epoch seconds). The index is rebuilt when it is older than `ttl` seconds,
+    or straight away when the optional `change_token()` (e.g. a directory mtime)
+    returns something different from the last build. Only one thread rebuilds at a
+    time; the others keep serving the previous listing.
+
+    Pages use a cursor that holds the sort key of the last item returned, so
+    paging stays consistent when files are added or removed between requests.
+    """
+
+    def __init__(self, loader, ttl=FILE_LISTING_TTL, change_token=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.change_token = change_token
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loaded_at = None
+        self._token = None
+        self._sorted = {}    # sort name -> (items, keys) in ascending order
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def query(self, prefix=None, extensions=AUDIO_EXTENSIONS, sort="name", descending=False,
+              limit=None, cursor=None, refresh=False):
+        """Return (items, next_cursor, total) for the filtered, sorted listing."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unsupported sort '{sort}', expected one of {sorted(SORT_KEYS)}")
+        items, keys = self._snapshot(refresh)[sort]
+
+        def matches(item):
+            name = item["name"]
+            return (not prefix or name.startswith(prefix)) and (not extensions or name.lower().endswith(extensions))
+
+        if cursor:
+            key = decode_cursor(cursor)
+            try:
+                start = bisect.bisect_left(keys, key) - 1 if descending else bisect.bisect_right(keys, key)
+            except TypeError as e:
+                # A cursor issued for a different sort order
+                raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+        else:
+            start = len(items) - 1 if descending else 0
+        step = -1 if descending else 1
+
+        page = []
+        index = start
+        while 0 <= index < len(items) and (limit is None or len(page) < limit):
+            if matches(items[index]):
+                page.append(items[index])
+            index += step
+
+        next_cursor = None
+        if limit is not None and len(page) == limit and 0 <= index < len(items):
+            next_cursor = encode_cursor(SORT_KEYS[sort](page[-1]))
+        total = sum(1 for item in items if matches(item))
+        return page, next_cursor, total
+
+    def _snapshot(self, refresh):
+        if refresh or self._is_stale():
+            # Single-flight: if another thread is already reloading, serve what we have
+            blocking = refresh or not self._sorted
+            if self._refresh_lock.acquire(blocking=blocking):
+                try:
+                    if refresh or self._is_stale():
+                        self._rebuild()
+                finally:
+                    self._refresh_lock.release()
+        with self._lock:
+            return self._sorted
+
+    def _is_stale(self):
+        with self._lock:
+            loaded_at, token = self._loaded_at, self._token
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            return True
+        return self.change_token is not None and self.change_token() != token
+
+    def _rebuild(self):
+        token = self.change_token() if self.change_token else None
+        items = self.loader()
+        sorted_views = {}
+        for name, sort_key in SORT_KEYS.items():
+            ordered = sorted(items, key=sort_key)
+            sorted_views[name] = (ordered, [sort_key(item) for item in ordered])
+        with self._lock:
+            self._sorted = sorted_views
+            self._token = token
+            self._loaded_at = time.monotonic()
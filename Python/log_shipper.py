@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from dotenv import load_dotenv
+import logger
+
+load_dotenv()
+LOG_SHIP_INTERVAL = float(os.getenv("LOG_SHIP_INTERVAL", "5"))         # seconds between passes
+LOG_SHIP_BATCH_SIZE = int(os.getenv("LOG_SHIP_BATCH_SIZE", "5000"))    # lines per file per pass
+LOG_SHIP_QUEUE_SIZE = int(os.getenv("LOG_SHIP_QUEUE_SIZE", "100"))     # pending flush requests
+LOG_SHIP_MAX_BACKOFF = float(os.getenv("LOG_SHIP_MAX_BACKOFF", "300"))  # cap when the DB is down
+
+
+class LogShipper:
+    """Ships app.log / frontend.log to SQL Server from a background thread.
+
+    Requests only call notify(), which drops a flush request into a bounded queue
+    and never blocks. The worker wakes on a request or every `interval` seconds
+    (a timed wake-up with nothing new in the log files does no work), ships at
+    most `batch_size` lines per file per pass and keeps going while it is
+    behind. When the database is unavailable it backs off exponentially: requests
+    arriving meanwhile do not cut the wait short, and are dropped (and counted)
+    once the queue is full.
+    """
+
+    def __init__(self, interval=LOG_SHIP_INTERVAL, batch_size=LOG_SHIP_BATCH_SIZE,
+                 queue_size=LOG_SHIP_QUEUE_SIZE, max_backoff=LOG_SHIP_MAX_BACKOFF):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "notifications": 0,
+            "dropped": 0,
+            "passes": 0,
+            "failures": 0,
+            "lines_shipped": 0,
+            "last_pass_seconds": None,
+            "last_success": None,
+            "last_error": None,
+        }
+
+    def start(self):
+        """Start the worker thread; does nothing if it is already running."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Ask for a pass soon. Safe to call from request handlers; never blocks."""
+        with self._lock:
+            self._stats["notifications"] += 1
+        try:
+            self._queue.put_nowait(time.time())
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["pending_bytes"] = self._pending_bytes()
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    def _pending_bytes(self):
+        # How far the database is behind the log files on disk
+        checkpoints = logger.load_checkpoints()
+        pending = 0
+        for path in (logger.BACKEND_LOG_PATH, logger.FRONTEND_LOG_PATH):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            saved = checkpoints.get(os.path.abspath(path), {})
+            offset = saved.get("offset", 0) if saved.get("inode") == stat.st_ino else 0
+            pending += max(stat.st_size - offset, 0)
+        return pending
+
+    def _drain(self):
+        # Any number of queued requests are satisfied by a single pass
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        backoff = None
+        while not self._stop.is_set():
+            if backoff:
+                # After a failure, wait out the backoff however many requests come in
+                if self._stop.wait(backoff):
+                    break
+            else:
+                try:
+                    self._queue.get(timeout=self.interval)
+                except queue.Empty:
+                    # Idle: no need for a DB connection unless lines were written without a notify()
+                    if not self._stop.is_set() and not self._pending_bytes():
+                        continue
+            self._drain()
+            if self._stop.is_set():
+                break
+            if self._ship_until_caught_up():
+                backoff = None
+            else:
+                backoff = min(2 * (backoff or self.interval), self.max_backoff)
+        # Final pass so nothing written before shutdown is left behind
+        self._ship_until_caught_up()
+
+    def _ship_until_caught_up(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                shipped = logger.ship_logs(self.batch_size)
+            except Exception as e:
+                with self._lock:
+                    self._stats["passes"] += 1
+                    self._stats["failures"] += 1
+                    self._stats["last_error"] = str(e)
+                print("❌ Log shipping failed:", str(e))
+                print(traceback.format_exc())
+                return False
+            with self._lock:
+                self._stats["passes"] += 1
+                self._stats["lines_shipped"] += shipped
+                self._stats["last_pass_seconds"] = time.perf_counter() - started
+                self._stats["last_success"] = time.time()
+            # A short pass means both files are caught up
+            if shipped < self.batch_size or self._stop.is_set():
+                return True
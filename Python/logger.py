@@ -1,18 +1,35 @@
 import os
 import re
-import pyodbc
 import json
 import traceback
 from datetime import datetime
 from dotenv import load_dotenv
 import hashlib
+from db_pool import get_pool
+from metrics import counter, histogram, ERRORS
+from json_logging import loads, dumps
 
 # Load environment variables
 load_dotenv()
-DB_CONN_STR = os.getenv("DB_CONN_STR")
 
 BACKEND_LOG_PATH = 'app.log'
 FRONTEND_LOG_PATH = 'frontend.log'
+# Remembers how far into each log file we have already shipped
+LOG_CHECKPOINT_PATH = os.getenv("LOG_CHECKPOINT_PATH", "log_offsets.json")
+# Rows sent to SQL Server per bulk insert + MERGE round-trip
+LOG_INSERT_BATCH_SIZE = int(os.getenv("LOG_INSERT_BATCH_SIZE", "1000"))
+
+LOG_SHIP_SECONDS = histogram("log_ship_seconds", "Time to read and insert new log lines", ("table",))
+LOG_LINES_SHIPPED = counter("log_lines_shipped_total", "Log lines inserted into the database", ("table",))
+
+# DDL only needs to run once per process
+_tables_initialized = False
+
+def ensure_tables(cursor):
+    # The caller sets _tables_initialized once its transaction commits: a pass that
+    # fails rolls the DDL back with it, and the next pass has to run it again
+    if not _tables_initialized:
+        create_tables_and_indexes(cursor)
 
 def create_tables_and_indexes(cursor):
     # Create BackendLogs table (no StackTrace)
@@ -76,21 +93,37 @@ def create_tables_and_indexes(cursor):
 
 def parse_log_line(line):
     # Example: 2025-05-22 15:22:30,123 - ERROR - Something bad happened
-    match = re.match(r'^(?P<timestamp>[\d\-:\s,.]+) - (?P<level>\w+) - (?P<message>.*)$', line)
-    if not match:
+    parts = line.split(' - ', 2)
+    if len(parts) != 3 or not parts[1].isidentifier():
         return None
-    ts_str = match.group('timestamp')
+    ts_str, level, message = parts
     try:
-        timestamp = datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S,%f')
+        # logging writes "15:22:30,123"; fromisoformat only takes a comma from Python 3.11
+        timestamp = datetime.fromisoformat(ts_str.replace(',', '.'))
     except ValueError:
-        try:
-            timestamp = datetime.strptime(ts_str, '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-            return None
-    level = match.group('level')
-    message = match.group('message')
+        return None
     return timestamp, level, message
 
+def parse_json_line(line):
+    # Example: {"ts": "2025-05-22T15:22:30.123", "level": "ERROR", "message": "...", "metadata": {...}}
+    try:
+        record = loads(line)
+        timestamp = datetime.fromisoformat(record['ts'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    message = record.get('message', '')
+    if record.get('exc'):
+        message = f"{message}\n{record['exc']}"
+    metadata = record.get('metadata')
+    return timestamp, record.get('level', 'INFO'), message, dumps(metadata) if metadata is not None else None
+
+def parse_record(line):
+    """(timestamp, level, message, metadata_json) for a JSON-lines or old text-format line, or None."""
+    if line.startswith('{'):
+        return parse_json_line(line)
+    parsed = parse_log_line(line)
+    return parsed + (None,) if parsed else None
+
 def extract_metadata(message):
     match = re.search(r'({.*})', message)
     if match:
@@ -100,93 +133,204 @@ def extract_metadata(message):
             return None
     return None
 
-def compute_log_hash(timestamp, level, message):
+def compute_log_hash(timestamp, level, message, metadata_json=None):
+    # Old text lines carry their metadata inside the message; JSON lines pass it separately
     combined = f"{timestamp.isoformat()}|{level}|{message}"
+    if metadata_json is not None:
+        combined += f"|{metadata_json}"
     return hashlib.sha256(combined.encode('utf-8')).hexdigest()
 
-def insert_logs(cursor, filepath, table_name, has_metadata=False):
+def load_checkpoints():
+    try:
+        with open(LOG_CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Could not read log checkpoints, starting from scratch: {e}")
+        return {}
+
+def save_checkpoints(checkpoints):
+    # Write to a temp file first so a crash never leaves a half-written checkpoint
+    tmp_path = f"{LOG_CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f)
+    os.replace(tmp_path, LOG_CHECKPOINT_PATH)
+
+def _read_complete_lines(filepath, offset, max_lines=None):
+    # Only hand back whole lines; a partially written last line is picked up next pass
+    lines = []
+    with open(filepath, 'rb') as file:
+        file.seek(offset)
+        for raw in file:
+            if not raw.endswith(b'\n') or (max_lines is not None and len(lines) >= max_lines):
+                break
+            lines.append(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+            offset += len(raw)
+    return lines, offset
+
+def read_new_lines(filepath, checkpoints, max_lines=None):
+    """Return up to max_lines lines appended to filepath since the last checkpoint and the new checkpoint."""
+    key = os.path.abspath(filepath)
+    saved = checkpoints.get(key, {})
+    stat = os.stat(filepath)
+    offset = saved.get('offset', 0)
+    lines = []
+
+    if saved and saved.get('inode') != stat.st_ino:
+        # File was rotated: finish the old file if it is still around as <name>.1
+        rotated_path = f"{filepath}.1"
+        if os.path.exists(rotated_path) and os.stat(rotated_path).st_ino == saved.get('inode'):
+            lines, _ = _read_complete_lines(rotated_path, offset)
+        offset = 0
+    elif stat.st_size < offset:
+        # File was truncated in place
+        offset = 0
+
+    if max_lines is not None:
+        max_lines = max(max_lines - len(lines), 0)
+    new_lines, new_offset = _read_complete_lines(filepath, offset, max_lines)
+    lines.extend(new_lines)
+    return lines, {'inode': stat.st_ino, 'offset': new_offset}
+
+def _build_log_row(line, has_metadata):
+    parsed = parse_record(line.strip())
+    if not parsed:
+        return None
+
+    timestamp, level, raw_message, metadata_json = parsed
+    log_hash = compute_log_hash(timestamp, level, raw_message, metadata_json)
+    message_text = raw_message
+    if not has_metadata:
+        metadata_json = None
+
+    # Old text-format lines carry metadata at the end of the message
+    elif metadata_json is None and " | Metadata:" in raw_message:
+        message_text, metadata_part = raw_message.split(" | Metadata:", 1)
+        message_text = message_text.strip()
+
+        try:
+            metadata_dict = json.loads(metadata_part.strip().replace("'", '"'))
+            metadata_json = json.dumps(metadata_dict)
+        except json.JSONDecodeError:
+            metadata_json = None
+
+    return (timestamp, level, message_text, metadata_json, log_hash)
+
+def _ensure_staging_table(cursor):
+    # Session-scoped, so it is created once per connection and reused across batches
+    cursor.execute("""
+        IF OBJECT_ID('tempdb..#LogStaging') IS NULL
+        CREATE TABLE #LogStaging (
+            LogTimestamp DATETIME NOT NULL,
+            LogLevel NVARCHAR(20) NOT NULL,
+            Message NVARCHAR(MAX) NOT NULL,
+            Metadata NVARCHAR(MAX) NULL,
+            LogHash CHAR(64) NOT NULL
+        )
+    """)
+
+def insert_log_batch(cursor, table_name, rows, has_metadata=False):
+    """Bulk-load rows into a staging table and merge the ones whose LogHash is new."""
+    if not rows:
+        return
+    _ensure_staging_table(cursor)
+    cursor.execute("TRUNCATE TABLE #LogStaging")
+    cursor.fast_executemany = True
+    cursor.executemany("""
+        INSERT INTO #LogStaging (LogTimestamp, LogLevel, Message, Metadata, LogHash)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+    cursor.fast_executemany = False
+    # BackendLogs has no Metadata column
+    columns = ["LogTimestamp", "LogLevel", "Message", "Metadata", "LogHash"] if has_metadata \
+        else ["LogTimestamp", "LogLevel", "Message", "LogHash"]
+    cursor.execute(f"""
+        MERGE {table_name} WITH (HOLDLOCK) AS target
+        USING #LogStaging AS source
+        ON target.LogHash = source.LogHash
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(columns)})
+            VALUES ({", ".join("source." + c for c in columns)});
+    """)
+    cursor.execute("TRUNCATE TABLE #LogStaging")
+
+def insert_logs(cursor, filepath, table_name, has_metadata=False, checkpoints=None, max_lines=None,
+                batch_size=LOG_INSERT_BATCH_SIZE):
     if not os.path.exists(filepath):
         print(f"⚠️ Log file not found: {filepath}")
-        return
+        return None, 0
 
-    with open(filepath, 'r', encoding='utf-8') as file:
-        for line in file:
-            try:
-                parsed = parse_log_line(line.strip())
-                if not parsed:
-                    continue
-
-                timestamp, level, raw_message = parsed
-                log_hash = compute_log_hash(timestamp, level, raw_message)
-
-                # Skip duplicates
-                cursor.execute(f"SELECT 1 FROM {table_name} WHERE LogHash = ?", (log_hash,))
-                if cursor.fetchone():
-                    continue
-
-                if has_metadata and " | Metadata:" in raw_message:
-                    message_text, metadata_part = raw_message.split(" | Metadata:", 1)
-                    message_text = message_text.strip()
-
-                    try:
-                        metadata_dict = json.loads(metadata_part.strip().replace("'", '"'))
-                        metadata_json = json.dumps(metadata_dict)
-                    except json.JSONDecodeError:
-                        metadata_json = None
-
-                    # cursor.execute(f"""
-                    #     INSERT INTO {table_name}
-                    #       (LogTimestamp, LogLevel, Message, Metadata, LogHash)
-                    #     VALUES (?, ?, ?, ?, ?)
-                    # """, (timestamp, level, message_text, metadata_json, log_hash))
-                    cursor.execute(f"""
-    INSERT INTO {table_name}
-      (LogTimestamp, LogLevel, Message, Metadata, LogHash)
-    VALUES (?, ?, ?, ?, ?)
-""", (timestamp, level, message_text, metadata_json, log_hash))
-
-
-                else:
-                    # cursor.execute(f"""
-                    #     INSERT INTO {table_name}
-                    #       (LogTimestamp, LogLevel, Message, LogHash)
-                    #     VALUES (?, ?, ?, ?)
-                    # """, (timestamp, level, raw_message, log_hash))
-                    cursor.execute("""
-    EXEC InsertBackendLog ?, ?, ?, ?
-""", (timestamp, level, raw_message, log_hash))
-
-
-            except Exception as e:
-                print(f"❌ Failed to process line: {line.strip()}")
-                print(f"    Reason: {e}")
+    if checkpoints is None:
+        checkpoints = {}
+    lines, checkpoint = read_new_lines(filepath, checkpoints, max_lines)
 
-def process_logs():
-    try:
-        conn = pyodbc.connect(DB_CONN_STR)
+    # Duplicates within the file are dropped here; duplicates already in the table by the MERGE
+    rows = {}
+    for line in lines:
+        try:
+            row = _build_log_row(line, has_metadata)
+            if row:
+                rows.setdefault(row[-1], row)
+        except Exception as e:
+            print(f"❌ Failed to process line: {line.strip()}")
+            print(f"    Reason: {e}")
+
+    rows = list(rows.values())
+    for start in range(0, len(rows), batch_size):
+        insert_log_batch(cursor, table_name, rows[start:start + batch_size], has_metadata)
+
+    return checkpoint, len(lines)
+
+def ship_logs(batch_size=None):
+    """Ship up to batch_size new lines per log file and return how many lines were read.
+
+    Unlike process_logs, errors are raised so callers can back off and retry.
+    """
+    global _tables_initialized
+    with get_pool().connection() as conn:
         cursor = conn.cursor()
 
-        create_tables_and_indexes(cursor)
+        ensure_tables(cursor)
+        checkpoints = load_checkpoints()
+        new_checkpoints = {}
+        shipped = 0
 
-        print("📥 Processing Backend Logs...")
-        insert_logs(cursor, BACKEND_LOG_PATH, 'BackendLogs')
-        print("✅ Backend logs complete.")
+        with LOG_SHIP_SECONDS.time(table='BackendLogs'):
+            checkpoint, count = insert_logs(
+                cursor, BACKEND_LOG_PATH, 'BackendLogs', checkpoints=checkpoints, max_lines=batch_size)
+        LOG_LINES_SHIPPED.inc(count, table='BackendLogs')
+        new_checkpoints[os.path.abspath(BACKEND_LOG_PATH)] = checkpoint
+        shipped += count
 
-        print("📥 Processing Frontend Logs...")
-        insert_logs(cursor, FRONTEND_LOG_PATH, 'FrontendLogs', has_metadata=True)
-        print("✅ Frontend logs complete.")
+        with LOG_SHIP_SECONDS.time(table='FrontendLogs'):
+            checkpoint, count = insert_logs(
+                cursor, FRONTEND_LOG_PATH, 'FrontendLogs', has_metadata=True,
+                checkpoints=checkpoints, max_lines=batch_size)
+        LOG_LINES_SHIPPED.inc(count, table='FrontendLogs')
+        new_checkpoints[os.path.abspath(FRONTEND_LOG_PATH)] = checkpoint
+        shipped += count
 
         conn.commit()
-        print("✅ Logs successfully inserted into the database.")
+        _tables_initialized = True
+        # Only move the offsets forward once the rows are safely committed
+        changed = {k: v for k, v in new_checkpoints.items() if v and checkpoints.get(k) != v}
+        if changed:
+            checkpoints.update(changed)
+            save_checkpoints(checkpoints)
+        cursor.close()
+        return shipped
+
+def process_logs():
+    try:
+        shipped = ship_logs()
+        print(f"✅ {shipped} log line(s) inserted into the database.")
+        return shipped
     except Exception as e:
+        ERRORS.inc(component="log_shipping", error=type(e).__name__)
         print("❌ Error during log processing:", str(e))
         print(traceback.format_exc())
-    finally:
-        try:
-            cursor.close()
-            conn.close()
-        except:
-            pass
+        return 0
 
 if __name__ == "__main__":
     process_logs()
@@ -0,0 +1,200 @@
+import time
+import bisect
+import logging
+import threading
+from functools import wraps
+
+# Request and stage latencies run from milliseconds (cache hits) to minutes (long calls)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_metrics = {}
+_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; set() it, or read it at scrape time with set_function()."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._functions = []
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn):
+        """fn() returns a number, or {label values tuple: number} for a labelled gauge."""
+        with self._lock:
+            self._functions.append(fn)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions)
+        for fn in functions:
+            try:
+                result = fn()
+            except Exception as e:
+                logging.error(f"Metric {self.name} could not be read: {e}")
+                continue
+            if isinstance(result, dict):
+                values.update({tuple(str(v) for v in k): v for k, v in result.items()})
+            elif result is not None:
+                values[()] = result
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def time(self, **labels):
+        return Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: (list(counts), count, total) for key, (counts, count, total) in self._values.items()}
+        lines = []
+        for key, (counts, count, total) in values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+        return lines
+
+
+class Timer:
+    """Observe elapsed seconds into a histogram; works as a context manager and a decorator.
+
+    Exceptions are counted in errors_total{component=<histogram name>} and re-raised.
+    """
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None:
+            ERRORS.inc(component=self.histogram.name, error=exc_type.__name__)
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Timer(self.histogram, self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, labels, **kwargs)
+        elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels")
+        return metric
+
+
+def counter(name, help, labels=()):
+    return _register(Counter, name, help, labels)
+
+
+def gauge(name, help, labels=()):
+    return _register(Gauge, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+STAGE_SECONDS = histogram(
+    "transcription_stage_seconds", "Time spent in each step of transcribing a file", ("stage", "model"))
+ERRORS = counter("errors_total", "Errors by component and exception type", ("component", "error"))
+
+
+def timed(stage, model=""):
+    """Time a block or function as one stage: `with timed("download"):` or `@timed("decode", "whisper")`."""
+    return STAGE_SECONDS.time(stage=stage, model=model)
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_metrics.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
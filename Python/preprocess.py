@@ -0,0 +1,165 @@
+import os
+import wave
+import shutil
+import subprocess
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+SAMPLE_RATE = 16000
+VAD_FRAME_SECONDS = 0.03
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-40"))      # frames quieter than this (dBFS) are silence
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", "1.0"))        # shorter pauses are kept inside speech
+VAD_PADDING = float(os.getenv("VAD_PADDING", "0.2"))                # seconds kept around each speech region
+SEGMENT_SECONDS = float(os.getenv("WHISPER_SEGMENT_SECONDS", "30"))  # one Whisper window
+SEGMENT_OVERLAP = float(os.getenv("WHISPER_SEGMENT_OVERLAP", "1.0"))
+# How far back from a segment's end to look for a quiet frame to cut on
+SEGMENT_CUT_SEARCH = 3.0
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode any audio file once to mono float32 at `sample_rate`, in [-1, 1].
+
+    Uses ffmpeg like Whisper itself; without it, plain PCM WAV files are still read.
+    """
+    if shutil.which("ffmpeg"):
+        cmd = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+        ]
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='replace')}") from e
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+    return _read_wav(path, sample_rate)
+
+
+def _read_wav(path, sample_rate):
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise RuntimeError(f"ffmpeg is not installed and {path} is not 16-bit PCM WAV")
+        channels, rate = f.getnchannels(), f.getframerate()
+        audio = np.frombuffer(f.readframes(f.getnframes()), np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(audio):
+        positions = np.arange(0, len(audio), rate / sample_rate)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def frame_levels(audio, sample_rate=SAMPLE_RATE, frame_seconds=VAD_FRAME_SECONDS):
+    """RMS level in dBFS of each consecutive frame."""
+    frame = int(sample_rate * frame_seconds)
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_regions(audio, sample_rate=SAMPLE_RATE, threshold_db=VAD_THRESHOLD_DB,
+                   min_silence=VAD_MIN_SILENCE, padding=VAD_PADDING):
+    """Energy-based VAD: (start, end) sample ranges that contain speech.
+
+    Pauses shorter than `min_silence` seconds stay inside a region so words are
+    not clipped; longer silences (e.g. on hold) between regions are dropped.
+    """
+    frame = int(sample_rate * VAD_FRAME_SECONDS)
+    voiced = np.flatnonzero(frame_levels(audio, sample_rate) > threshold_db)
+    if len(voiced) == 0:
+        return []
+    max_gap = max(int(min_silence / VAD_FRAME_SECONDS), 1)
+    pad = int(padding * sample_rate)
+    # Split wherever two voiced frames are further apart than the allowed pause
+    breaks = np.flatnonzero(np.diff(voiced) > max_gap)
+    starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+    return [
+        (max(int(s) * frame - pad, 0), min(int(e) * frame + pad, len(audio)))
+        for s, e in zip(starts, ends)
+    ]
+
+
+def plan_segments(audio, regions, sample_rate=SAMPLE_RATE, segment_seconds=SEGMENT_SECONDS,
+                  overlap=SEGMENT_OVERLAP):
+    """Turn speech regions into (start, end) windows of at most `segment_seconds`.
+
+    Short neighbouring regions share a window. Long regions are cut on the
+    quietest frame near the window end, and the next window starts `overlap`
+    seconds earlier so a word on the cut is heard by both.
+    """
+    limit = int(segment_seconds * sample_rate)
+    overlap_samples = int(overlap * sample_rate)
+    segments = []
+    for start, end in regions:
+        if segments and end - segments[-1][0] <= limit:
+            # Fits in the previous window: keep the pause in between rather than add a window
+            segments[-1] = (segments[-1][0], end)
+            continue
+        while end - start > limit:
+            cut = _quiet_cut(audio, start + limit // 2, start + limit, sample_rate)
+            segments.append((start, cut))
+            start = max(cut - overlap_samples, start + 1)
+        segments.append((start, end))
+    return segments
+
+
+def _quiet_cut(audio, earliest, end, sample_rate):
+    window_start = max(end - int(SEGMENT_CUT_SEARCH * sample_rate), earliest)
+    levels = frame_levels(audio[window_start:end], sample_rate)
+    if len(levels) == 0:
+        return end
+    frame = int(sample_rate * VAD_FRAME_SECONDS)
+    return window_start + (int(np.argmin(levels)) + 1) * frame
+
+
+def window_segments(segments, index, result, sample_rate=SAMPLE_RATE):
+    """The segments of window `index`'s Whisper result that belong to it, with absolute timestamps.
+
+    Where two windows overlap, each keeps the segments centred on its own side
+    of the middle of the overlap.
+    """
+    start, end = segments[index]
+    offset = start / sample_rate
+    low = high = None
+    if index and segments[index - 1][1] > start:
+        low = (start + segments[index - 1][1]) / 2 / sample_rate
+    if index + 1 < len(segments) and segments[index + 1][0] < end:
+        high = (segments[index + 1][0] + end) / 2 / sample_rate
+    kept = []
+    for s in result["segments"]:
+        s_start, s_end = s["start"] + offset, s["end"] + offset
+        middle = (s_start + s_end) / 2
+        if (low is not None and middle < low) or (high is not None and middle >= high):
+            continue
+        kept.append({"start": round(s_start, 3), "end": round(s_end, 3), "text": s["text"].strip()})
+    return kept
+
+
+def stitch(segments, results, sample_rate=SAMPLE_RATE):
+    """Merge per-window Whisper results into one transcript with absolute timestamps."""
+    merged = []
+    for index, result in enumerate(results):
+        merged.extend(window_segments(segments, index, result, sample_rate))
+    return join_segments(merged)
+
+
+def join_segments(merged):
+    return {
+        "text": " ".join(s["text"] for s in merged if s["text"]),
+        "segments": merged,
+    }
+
+
+def prepare(path, sample_rate=SAMPLE_RATE):
+    """Decode, trim silence and split a recording.
+
+    Returns (audio, segments, duration_seconds); slice `audio` with each
+    (start, end) to get the clips to transcribe.
+    """
+    audio = decode_audio(path, sample_rate)
+    regions = speech_regions(audio, sample_rate)
+    return audio, plan_segments(audio, regions, sample_rate), len(audio) / sample_rate
@@ -0,0 +1,120 @@
+import os
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+# Recordings are moved in fixed-size pieces so memory stays flat however long the call is
+STAGING_CHUNK_SIZE = int(os.getenv("STAGING_CHUNK_SIZE", str(1024 * 1024)))
+# Blobs at least this big are fetched with parallel ranged GETs
+AZURE_PARALLEL_DOWNLOAD_THRESHOLD = int(os.getenv("AZURE_PARALLEL_DOWNLOAD_THRESHOLD", str(32 * 1024 * 1024)))
+AZURE_DOWNLOAD_CONCURRENCY = int(os.getenv("AZURE_DOWNLOAD_CONCURRENCY", "4"))
+# Files staged ahead of the one being transcribed
+STAGING_PREFETCH = int(os.getenv("STAGING_PREFETCH", "2"))
+
+
+def hash_file(path, chunk_size=STAGING_CHUNK_SIZE):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def write_chunks(chunks, dst_path):
+    """Write an iterable of byte chunks to dst_path and return their SHA-256."""
+    sha = hashlib.sha256()
+    with open(dst_path, "wb") as dst:
+        for chunk in chunks:
+            sha.update(chunk)
+            dst.write(chunk)
+    return sha.hexdigest()
+
+
+def copy_stream(src, dst_path, chunk_size=STAGING_CHUNK_SIZE):
+    return write_chunks(iter(lambda: src.read(chunk_size), b""), dst_path)
+
+
+def stage_local_file(src_path, dst_path):
+    """Make src_path available at dst_path and return its SHA-256.
+
+    A hard link costs no copy at all, so the only read is the hash; when linking
+    is not possible (different volume, unsupported filesystem) the file is
+    copied and hashed in the same pass.
+    """
+    if os.path.abspath(src_path) == os.path.abspath(dst_path):
+        return hash_file(src_path)
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+        return hash_file(dst_path)
+    except OSError:
+        with open(src_path, "rb") as src:
+            return copy_stream(src, dst_path)
+
+
+def stage_blob(blob_client, dst_path, max_concurrency=AZURE_DOWNLOAD_CONCURRENCY,
+               parallel_threshold=AZURE_PARALLEL_DOWNLOAD_THRESHOLD):
+    """Download a blob to dst_path and return its SHA-256.
+
+    Small blobs are streamed chunk by chunk and hashed on the way. Large ones are
+    fetched with `max_concurrency` parallel ranged GETs; those land out of order,
+    so the file is hashed afterwards from local disk.
+    """
+    downloader = blob_client.download_blob(max_concurrency=max_concurrency)
+    if downloader.size < parallel_threshold:
+        return write_chunks(downloader.chunks(), dst_path)
+    with open(dst_path, "wb") as dst:
+        downloader.readinto(dst)
+    return hash_file(dst_path)
+
+
+def save_upload(file_storage, dst_path):
+    """Save a werkzeug upload to dst_path and return its SHA-256."""
+    return copy_stream(file_storage.stream, dst_path)
+
+
+def prefetch(items, fn, depth=STAGING_PREFETCH, discard=None):
+    """Yield (item, future) in order while fn runs up to `depth` items ahead.
+
+    Used to download the next files of a batch while the current one is being
+    transcribed. If the caller stops early (an error, a closed generator), work
+    not yet started is cancelled and work already running is waited for, and
+    discard(item, result) is called for each result that was never yielded.
+    """
+    if depth < 1:
+        for item in items:
+            yield item, _completed(fn, item)
+        return
+    pool = ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) > depth:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        for item, future in pending:
+            if future.cancel():
+                continue
+            try:
+                result = future.result()
+                if discard:
+                    discard(item, result)
+            except Exception as e:
+                logging.warning(f"Discarding prefetched {item!r} failed: {e}")
+        pool.shutdown(wait=True)
+
+
+def _completed(fn, item):
+    future = Future()
+    try:
+        future.set_result(fn(item))
+    except Exception as e:
+        future.set_exception(e)
+    return future
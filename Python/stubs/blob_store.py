@@ -0,0 +1,145 @@
+"""Local stand-in for Azure Blob Storage, backed by a directory.
+
+Implements the part of azure.storage.blob the app uses: BlobServiceClient
+.get_blob_client / .get_container_client, ContainerClient.list_blobs and
+.upload_blob, BlobClient.get_blob_properties and .download_blob (whole blob or
+an offset/length range), and a downloader with size, chunks(), readall() and
+readinto(). Each container is a sub-directory of `root`. An optional per-call
+`latency` stands in for the round trip to Azure.
+
+Install it for a connection string before the app first asks for a client:
+
+    from blob_store import install
+    install(os.environ["AZURE_CONNECTION_STRING"], "/tmp/blobs")
+
+There is no account key, so SAS URLs cannot be made and Deepgram gets
+Azure files uploaded, as it does with a connection string that has none.
+"""
+import datetime
+import hashlib
+import os
+import time
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class BlobProperties:
+    def __init__(self, name, path):
+        stat = os.stat(path)
+        self.name = name
+        self.size = stat.st_size
+        self.last_modified = datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc)
+        self.etag = '"' + hashlib.md5(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest() + '"'
+
+
+class StorageStreamDownloader:
+    def __init__(self, path, offset=0, length=None, chunk_size=CHUNK_SIZE):
+        total = os.path.getsize(path)
+        self.path = path
+        self.offset = offset or 0
+        self.size = max(min(total - self.offset, length if length is not None else total), 0)
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            remaining = self.size
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def readall(self):
+        return b"".join(self.chunks())
+
+    def readinto(self, stream):
+        written = 0
+        for chunk in self.chunks():
+            stream.write(chunk)
+            written += len(chunk)
+        return written
+
+
+class BlobClient:
+    def __init__(self, service, container, blob):
+        self.service = service
+        self.container_name = container
+        self.blob_name = blob
+        self.account_name = service.account_name
+        self.credential = None
+        self.url = f"{service.url}/{container}/{blob}"
+        self.path = os.path.join(service.root, container, blob)
+
+    def get_blob_properties(self):
+        self.service.wait()
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"Blob not found: {self.container_name}/{self.blob_name}")
+        return BlobProperties(self.blob_name, self.path)
+
+    def download_blob(self, offset=None, length=None, max_concurrency=1, **kwargs):
+        self.service.wait()
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"Blob not found: {self.container_name}/{self.blob_name}")
+        return StorageStreamDownloader(self.path, offset, length)
+
+    def upload_blob(self, data, overwrite=False, **kwargs):
+        self.service.wait()
+        if os.path.exists(self.path) and not overwrite:
+            raise FileExistsError(f"Blob already exists: {self.container_name}/{self.blob_name}")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(data if isinstance(data, bytes) else data.read())
+
+
+class ContainerClient:
+    def __init__(self, service, container):
+        self.service = service
+        self.container_name = container
+        self.path = os.path.join(service.root, container)
+
+    def list_blobs(self, name_starts_with=None, **kwargs):
+        self.service.wait()
+        for dirpath, _, files in os.walk(self.path):
+            for filename in sorted(files):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.path).replace(os.sep, "/")
+                if name_starts_with is None or name.startswith(name_starts_with):
+                    yield BlobProperties(name, path)
+
+    def get_blob_client(self, blob):
+        return BlobClient(self.service, self.container_name, blob)
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        client = self.get_blob_client(name)
+        client.upload_blob(data, overwrite=overwrite)
+        return client
+
+
+class BlobServiceClient:
+    def __init__(self, root, account_name="devstoreaccount1", latency=0.0):
+        self.root = root
+        self.account_name = account_name
+        self.latency = latency
+        self.url = f"http://127.0.0.1:10000/{account_name}"
+        os.makedirs(root, exist_ok=True)
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_blob_client(self, container, blob):
+        return BlobClient(self, container, blob)
+
+    def get_container_client(self, container):
+        return ContainerClient(self, container)
+
+
+def install(connection_string, root, **kwargs):
+    """Make azure_client.get_blob_service_client(connection_string) return a local store at root."""
+    import azure_client
+    client = BlobServiceClient(root, **kwargs)
+    with azure_client._lock:
+        azure_client._clients[connection_string] = client
+    return client
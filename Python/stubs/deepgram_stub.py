@@ -0,0 +1,114 @@
+"""Local stand-in for the Deepgram /v1/listen endpoint.
+
+Accepts both request shapes analyze_audio_with_deepgram sends (a JSON
+{"url": ...} body or the raw audio bytes) and answers with the same JSON
+layout as Deepgram. Point the app at it with:
+
+    DEEPGRAM_API_URL=http://127.0.0.1:8765/v1/listen
+
+Usage (from the Python/ directory):
+
+    python stubs/deepgram_stub.py --port 8765 --latency 0.2 --fail-rate 0.1
+
+Tests can run it in-process with start_stub_server(port=0), which returns the
+server; its base URL is `server.url` and server.shutdown() stops it.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DeepgramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not self.path.startswith("/v1/listen"):
+            return self._reply(404, {"err_msg": f"Unknown path {self.path}"})
+        if not self.headers.get("Authorization", "").startswith("Token "):
+            return self._reply(401, {"err_msg": "Missing API key"})
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            source = json.loads(body or b"{}").get("url")
+            if not source:
+                return self._reply(400, {"err_msg": "Missing url"})
+        else:
+            source = f"{len(body)} bytes"
+
+        with server.lock:
+            server.requests_seen += 1
+            server.bytes_received += len(body)
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and random.random() < server.fail_rate:
+            return self._reply(server.fail_status, {"err_msg": "Injected failure"})
+
+        transcript = server.transcript or f"stub transcription of {source}"
+        self._reply(200, {
+            "metadata": {"request_id": f"stub-{server.requests_seen}"},
+            "results": {"channels": [{"alternatives": [{"transcript": transcript, "confidence": 1.0}]}]},
+        })
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, fail_status=503, transcript=None, quiet=True):
+    server = ThreadingHTTPServer((host, port), DeepgramStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.fail_status = fail_status
+    server.transcript = transcript
+    server.quiet = quiet
+    server.lock = threading.Lock()
+    server.requests_seen = 0
+    server.bytes_received = 0
+    server.url = f"http://{host}:{server.server_address[1]}/v1/listen"
+    return server
+
+
+def start_stub_server(**kwargs):
+    """Start the stub on a background thread and return the server."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="deepgram-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--transcript", help="fixed transcript to return")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.fail_rate, args.fail_status, args.transcript,
+                         quiet=False)
+    print(f"Deepgram stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
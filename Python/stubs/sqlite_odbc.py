@@ -0,0 +1,176 @@
+"""Local stand-in for pyodbc + SQL Server, backed by SQLite.
+
+Implements the part of the pyodbc API db_pool uses (connect, cursor, execute,
+executemany, fetchone/fetchall, commit, rollback, close) and translates the
+T-SQL this app sends: the InsertAudioDetailsIfNotExists and
+InsertTranscriptionResult procedures, the log tables' DDL, the #LogStaging
+bulk load and MERGE, and SELECT TOP n. The schema is created on connect.
+
+It is not a general T-SQL translator; it exists so benchmarks can run the
+whole app without a SQL Server. Use it by installing it as pyodbc before
+db_pool is imported:
+
+    import sys, sqlite_odbc
+    sys.modules["pyodbc"] = sqlite_odbc
+    os.environ["DB_CONN_STR"] = "Database=/tmp/bench.db"
+"""
+import datetime
+import re
+import sqlite3
+
+Error = sqlite3.Error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS AudioDetails (
+    AudioID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EntityID INTEGER,
+    FileName TEXT NOT NULL,
+    FilePath TEXT,
+    FileHash TEXT UNIQUE,
+    CreatedAt TEXT,
+    UpdatedAt TEXT
+);
+CREATE TABLE IF NOT EXISTS TranscriptionResults (
+    TranscriptionID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EntityID INTEGER,
+    ModelName TEXT NOT NULL,
+    FileName TEXT NOT NULL,
+    TranscriptionHash TEXT,
+    TranscriptionText TEXT,
+    CreatedAt TEXT,
+    UpdatedAt TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_TranscriptionResults_FileName ON TranscriptionResults(FileName, ModelName);
+CREATE TABLE IF NOT EXISTS BackendLogs (
+    LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    LogTimestamp TEXT NOT NULL,
+    LogLevel TEXT NOT NULL,
+    Message TEXT NOT NULL,
+    LogHash TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS FrontendLogs (
+    LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    LogTimestamp TEXT NOT NULL,
+    LogLevel TEXT NOT NULL,
+    Message TEXT NOT NULL,
+    Metadata TEXT,
+    LogHash TEXT UNIQUE
+);
+CREATE TEMP TABLE IF NOT EXISTS LogStaging (
+    LogTimestamp TEXT NOT NULL,
+    LogLevel TEXT NOT NULL,
+    Message TEXT NOT NULL,
+    Metadata TEXT,
+    LogHash TEXT NOT NULL
+);
+"""
+
+PROCEDURES = {
+    # (EntityID, FileName, FilePath, FileHash, CreatedAt, UpdatedAt); a known hash is left alone
+    "InsertAudioDetailsIfNotExists": """
+        INSERT OR IGNORE INTO AudioDetails (EntityID, FileName, FilePath, FileHash, CreatedAt, UpdatedAt)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    # (EntityID, ModelName, FileName, TranscriptionHash, TranscriptionText, CreatedAt, UpdatedAt)
+    "InsertTranscriptionResult": """
+        INSERT INTO TranscriptionResults
+            (EntityID, ModelName, FileName, TranscriptionHash, TranscriptionText, CreatedAt, UpdatedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+_MERGE = re.compile(r"MERGE\s+(\w+).*?INSERT\s*\(([^)]*)\)", re.S | re.I)
+_TOP = re.compile(r"SELECT\s+TOP\s+(\d+)\s+", re.I)
+
+
+def _translate(sql):
+    """SQLite text for one T-SQL statement, or None for statements with nothing to do here."""
+    sql = sql.strip().replace("#LogStaging", "LogStaging")
+    upper = sql.upper()
+    if upper.startswith("EXEC"):
+        name = sql.split()[1]
+        if name not in PROCEDURES:
+            raise Error(f"Unknown stored procedure {name}")
+        return PROCEDURES[name]
+    if upper.startswith("IF "):
+        # Conditional DDL; the schema already exists
+        return None
+    if upper.startswith("TRUNCATE TABLE"):
+        return "DELETE FROM " + sql.split()[2]
+    if upper.startswith("MERGE"):
+        match = _MERGE.search(sql)
+        table, columns = match.group(1), match.group(2)
+        return f"INSERT OR IGNORE INTO {table} ({columns}) SELECT {columns} FROM LogStaging"
+    match = _TOP.match(sql)
+    if match:
+        return f"SELECT {sql[match.end():].rstrip().rstrip(';')} LIMIT {match.group(1)}"
+    return sql
+
+
+def _param(value):
+    # SQL Server stores DATETIME; here they are ISO strings, which sort the same way
+    return value.isoformat(sep=" ") if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+
+class Cursor:
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.fast_executemany = False
+
+    def execute(self, sql, params=()):
+        translated = _translate(sql)
+        if translated is not None:
+            self._cursor.execute(translated, [_param(p) for p in params])
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        translated = _translate(sql)
+        if translated is not None:
+            self._cursor.executemany(translated, ([_param(p) for p in params] for params in seq_of_params))
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path, timeout=30):
+        # Pooled connections move between threads, one thread at a time
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def cursor(self):
+        return Cursor(self._conn)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(conn_str, timeout=30, **kwargs):
+    """conn_str is an ODBC-style string; only its Database=<path> part is used."""
+    settings = dict(
+        part.split("=", 1) for part in (conn_str or "").split(";") if "=" in part
+    )
+    settings = {k.strip().lower(): v.strip() for k, v in settings.items()}
+    return Connection(settings.get("database", "stub.db"), timeout=timeout)
+
+
+def table_counts(path, tables=("AudioDetails", "TranscriptionResults", "BackendLogs", "FrontendLogs")):
+    """Row count per table, for checking what a run wrote."""
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+    finally:
+        conn.close()
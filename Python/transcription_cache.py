@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from dotenv import load_dotenv
+from db_pool import get_pool
+from metrics import counter
+
+load_dotenv()
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", "transcription_cache")
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "10000"))
+TRANSCRIPTION_CACHE_MAX_AGE_DAYS = float(os.getenv("TRANSCRIPTION_CACHE_MAX_AGE_DAYS", "30"))
+# Off by default: DB rows do not record model params (see TranscriptionCache)
+TRANSCRIPTION_CACHE_DB_LOOKUP = os.getenv("TRANSCRIPTION_CACHE_DB_LOOKUP", "false").lower() == "true"
+# Tables written by InsertAudioDetailsIfNotExists / InsertTranscriptionResult. Their
+# definitions are not part of this repo; the column defaults are the procedures' parameter names.
+AUDIO_DETAILS_TABLE = os.getenv("AUDIO_DETAILS_TABLE", "AudioDetails")
+AUDIO_NAME_COLUMN = os.getenv("AUDIO_NAME_COLUMN", "FileName")
+AUDIO_HASH_COLUMN = os.getenv("AUDIO_HASH_COLUMN", "FileHash")
+TRANSCRIPTION_TABLE = os.getenv("TRANSCRIPTION_TABLE", "TranscriptionResults")
+TRANSCRIPTION_NAME_COLUMN = os.getenv("TRANSCRIPTION_NAME_COLUMN", "FileName")
+TRANSCRIPTION_MODEL_COLUMN = os.getenv("TRANSCRIPTION_MODEL_COLUMN", "ModelName")
+TRANSCRIPTION_TEXT_COLUMN = os.getenv("TRANSCRIPTION_TEXT_COLUMN", "TranscriptionText")
+TRANSCRIPTION_CREATED_COLUMN = os.getenv("TRANSCRIPTION_CREATED_COLUMN", "CreatedAt")
+# What a failed Whisper run stores as its transcription (audio.process_audio_file)
+FAILED_TRANSCRIPTION = "Error transcribing audio."
+
+
+CACHE_EVENTS = counter("transcription_cache_events_total", "Cache hits, misses, stores and evictions", ("event",))
+
+
+class TranscriptionCache:
+    """Transcriptions keyed by (audio SHA-256, model name, model params).
+
+    Entries are JSON files under `directory`. A hit refreshes the file's mtime
+    and, once there are more than `max_entries`, the least recently used
+    entries are removed; entries older than `max_age_days` are treated as
+    misses.
+
+    With `db_lookup` (TRANSCRIPTION_CACHE_DB_LOOKUP=true), a disk miss also
+    checks the transcription table for an earlier run of the same audio with
+    the same model; failed runs, and files whose name was also used for
+    different audio, are ignored. The table only records the model name, not
+    its params, so such a hit may come from e.g. another Whisper model size.
+    It is off by default for that reason, and DB hits are never copied to disk.
+    """
+
+    def __init__(self, directory=TRANSCRIPTION_CACHE_DIR, max_entries=TRANSCRIPTION_CACHE_MAX_ENTRIES,
+                 max_age_days=TRANSCRIPTION_CACHE_MAX_AGE_DAYS, db_lookup=TRANSCRIPTION_CACHE_DB_LOOKUP):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.db_lookup = db_lookup
+        self._lock = threading.Lock()
+        self._entries = None
+        self._stats = {"disk_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def key(self, audio_hash, model_name, params=None):
+        raw = json.dumps([audio_hash, model_name, params or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, audio_hash, model_name, params=None):
+        result = self._get_from_disk(audio_hash, model_name, params)
+        if result is not None:
+            self._count("disk_hits")
+            return result
+        if self.db_lookup:
+            result = self._get_from_db(audio_hash, model_name)
+            if result is not None:
+                # Not written to disk: the DB row does not record the params it was made with
+                self._count("db_hits")
+                return result
+        self._count("misses")
+        return None
+
+    def put(self, audio_hash, model_name, result, params=None):
+        path = self._path(self.key(audio_hash, model_name, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"audio_hash": audio_hash, "model": model_name, "params": params or {},
+                 "created_at": time.time(), "result": result}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._count("stores")
+        with self._lock:
+            if self._entries is not None:
+                self._entries += 1
+        self._evict_if_needed()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._entries
+        lookups = stats["disk_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["disk_hits"] + stats["db_hits"]) / lookups, 3) if lookups else None
+        return stats
+
+    def _path(self, key):
+        # Two-character shard directories keep any one directory small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+        CACHE_EVENTS.inc(event=name)
+
+    def _get_from_disk(self, audio_hash, model_name, params):
+        path = self._path(self.key(audio_hash, model_name, params))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if self.max_age and time.time() - entry.get("created_at", 0) > self.max_age:
+            return None
+        try:
+            os.utime(path)  # mark as recently used for LRU eviction
+        except OSError:
+            pass
+        return entry["result"]
+
+    def _get_from_db(self, audio_hash, model_name):
+        try:
+            with get_pool().connection() as conn:
+                cursor = conn.cursor()
+                # Transcriptions are linked to audio by FileName only, so a row is trusted
+                # just when no other audio was ever registered under that name
+                cursor.execute(f"""
+                    SELECT TOP 1 t.{TRANSCRIPTION_TEXT_COLUMN}
+                    FROM {TRANSCRIPTION_TABLE} t
+                    JOIN {AUDIO_DETAILS_TABLE} a ON a.{AUDIO_NAME_COLUMN} = t.{TRANSCRIPTION_NAME_COLUMN}
+                    WHERE a.{AUDIO_HASH_COLUMN} = ? AND t.{TRANSCRIPTION_MODEL_COLUMN} = ?
+                      AND t.{TRANSCRIPTION_TEXT_COLUMN} <> ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM {AUDIO_DETAILS_TABLE} other
+                          WHERE other.{AUDIO_NAME_COLUMN} = t.{TRANSCRIPTION_NAME_COLUMN}
+                            AND other.{AUDIO_HASH_COLUMN} <> a.{AUDIO_HASH_COLUMN}
+                      )
+                    ORDER BY t.{TRANSCRIPTION_CREATED_COLUMN} DESC
+                """, (audio_hash, model_name, FAILED_TRANSCRIPTION))
+                row = cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            logging.error(f"Transcription cache DB lookup failed: {e}")
+            return None
+        return {"transcription": row[0]} if row else None
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = len(self._scan())
+            # Evict in chunks of 10% so we do not rescan the directory on every store
+            if self._entries <= self.max_entries:
+                return
+            entries = sorted(self._scan())
+            target = int(self.max_entries * 0.9) or self.max_entries
+            evicted = 0
+            for _, path in entries[:max(len(entries) - target, 0)]:
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except OSError:
+                    pass
+            self._entries = len(entries) - evicted
+            self._stats["evictions"] += evicted
+        CACHE_EVENTS.inc(evicted, event="evictions")
@@ -0,0 +1,311 @@
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import traceback
+import multiprocessing as mp
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from metrics import gauge
+
+load_dotenv()
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "1"))            # model processes kept warm
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))      # short clips decoded together
+WHISPER_BATCH_WAIT = float(os.getenv("WHISPER_BATCH_WAIT", "0.05"))  # seconds a worker waits to fill a batch
+WHISPER_START_RETRIES = int(os.getenv("WHISPER_START_RETRIES", "3"))   # failed model loads in a row before giving up
+WHISPER_RESULT_TIMEOUT = float(os.getenv("WHISPER_RESULT_TIMEOUT", "900"))  # seconds to wait for one clip
+# Longest pause between restarts of a worker that keeps dying while loading the model
+RESPAWN_BACKOFF_MAX = 60
+
+SAMPLE_RATE = 16000
+# Clips up to one Whisper window (30s) can be decoded as a single batched forward pass
+SHORT_CLIP_SAMPLES = 30 * SAMPLE_RATE
+
+
+class WhisperUnavailable(RuntimeError):
+    pass
+
+
+def _load(whisper, audio):
+    return whisper.load_audio(audio) if isinstance(audio, str) else audio
+
+
+def _transcribe_one(model, audio, options):
+    result = model.transcribe(audio, **options)
+    return {
+        "text": result["text"],
+        "segments": [
+            {"start": s["start"], "end": s["end"], "text": s["text"]}
+            for s in result.get("segments", [])
+        ],
+    }
+
+
+def _decode_batch(whisper, torch, model, clips):
+    # One forward pass for several short clips instead of one transcribe() call each
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+        for audio in clips
+    ]).to(model.device)
+    options = whisper.DecodingOptions(fp16=model.device.type == "cuda")
+    decoded = whisper.decode(model, mels, options)
+    return [
+        {"text": d.text, "segments": [{"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": d.text}]}
+        for d, audio in zip(decoded, clips)
+    ]
+
+
+def _run_batch(whisper, torch, model, batch, results):
+    short = []
+    for job_id, audio, options, timestamps in batch:
+        try:
+            audio = _load(whisper, audio)
+            # A batched decode gives one segment spanning the whole clip, so only
+            # clips whose callers need no segment timestamps go that way
+            if not options and not timestamps and len(audio) <= SHORT_CLIP_SAMPLES:
+                short.append((job_id, audio))
+            else:
+                results.put(("done", job_id, (_transcribe_one(model, audio, options), None)))
+        except Exception:
+            results.put(("done", job_id, (None, traceback.format_exc())))
+
+    if len(short) > 1:
+        try:
+            outputs = _decode_batch(whisper, torch, model, [audio for _, audio in short])
+            for (job_id, _), output in zip(short, outputs):
+                results.put(("done", job_id, (output, None)))
+            return
+        except Exception:
+            traceback.print_exc()
+    # Single clip, or the batched pass failed: fall back to the regular path
+    for job_id, audio in short:
+        try:
+            results.put(("done", job_id, (_transcribe_one(model, audio, {}), None)))
+        except Exception:
+            results.put(("done", job_id, (None, traceback.format_exc())))
+
+
+def _worker_main(model_name, jobs, results, batch_size, batch_wait):
+    # Heavy imports only ever happen in the worker processes
+    import torch
+    import whisper
+
+    model = whisper.load_model(model_name)
+    pid = os.getpid()
+    results.put(("ready", pid, None))
+    stopping = False
+    while not stopping:
+        job = jobs.get()
+        if job is None:
+            break
+        batch = [job]
+        deadline = time.monotonic() + batch_wait
+        while len(batch) < batch_size:
+            try:
+                job = jobs.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if job is None:
+                stopping = True
+                break
+            batch.append(job)
+        results.put(("started", pid, [job[0] for job in batch]))
+        _run_batch(whisper, torch, model, batch, results)
+
+
+class WhisperServer:
+    """Pool of Whisper worker processes that keep the model loaded.
+
+    submit() accepts a file path or a 16 kHz float32 array and returns a Future.
+    Each worker pulls up to `batch_size` queued clips at once and decodes the
+    ones shorter than 30s in a single batched pass. If a worker dies, the jobs it
+    was running fail and a replacement worker is started. Workers that die
+    before the model is loaded are restarted with exponential backoff; after
+    `start_retries` such failures in a row with no worker ready, the pool gives
+    up and every pending and later job fails with WhisperUnavailable.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, workers=WHISPER_WORKERS,
+                 batch_size=WHISPER_BATCH_SIZE, batch_wait=WHISPER_BATCH_WAIT,
+                 start_retries=WHISPER_START_RETRIES):
+        self.model_name = model_name
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self.batch_wait = batch_wait
+        self.start_retries = max(start_retries, 1)
+        self._ctx = mp.get_context("spawn")
+        self._jobs = None
+        self._results = None
+        self._processes = {}
+        self._futures = {}
+        self._running_on = {}    # pid -> job ids it is currently working on
+        self._ready = set()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._stopping = False
+        self._start_failures = 0     # workers in a row that died before loading the model
+        self._respawn_at = 0.0
+        self._error = None           # set once the pool has given up
+
+    def start(self):
+        with self._lock:
+            if self._dispatcher:
+                return
+            self._jobs = self._ctx.Queue()
+            self._results = self._ctx.Queue()
+            for _ in range(self.workers):
+                self._spawn()
+            self._dispatcher = threading.Thread(target=self._dispatch, name="whisper-dispatch", daemon=True)
+            self._dispatcher.start()
+
+    def stop(self, timeout=10):
+        self._stopping = True
+        if not self._dispatcher:
+            return
+        for _ in self._processes:
+            self._jobs.put(None)
+        for process in list(self._processes.values()):
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def submit(self, audio, timestamps=False, **options):
+        """timestamps=True runs the clip through transcribe() even when it could be batched,
+        for callers that need each segment's own start and end.
+        """
+        self.start()
+        future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            if self._error:
+                future.set_exception(WhisperUnavailable(self._error))
+                return future
+            self._futures[job_id] = future
+        self._jobs.put((job_id, audio, options, timestamps))
+        return future
+
+    def transcribe(self, audio, timeout=None, **options):
+        return self.submit(audio, **options).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "workers": len(self._processes),
+                "ready_workers": len(self._ready),
+                "pending_jobs": len(self._futures),
+                "batch_size": self.batch_size,
+                "error": self._error,
+            }
+
+    def _spawn(self):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_name, self._jobs, self._results, self.batch_size, self.batch_wait),
+            daemon=True,
+        )
+        process.start()
+        self._processes[process.pid] = process
+
+    def _dispatch(self):
+        while not self._stopping:
+            self._reap()
+            try:
+                kind, key, payload = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if kind == "ready":
+                    if key not in self._processes:
+                        continue
+                    self._ready.add(key)
+                    self._start_failures = 0
+                    self._error = None
+                elif kind == "started":
+                    if key in self._processes:
+                        self._running_on[key] = set(payload)
+                    else:
+                        # The worker was reaped before this message was read
+                        self._fail(payload, RuntimeError(f"Whisper worker {key} exited"))
+                else:
+                    output, error = payload
+                    for running in self._running_on.values():
+                        running.discard(key)
+                    future = self._futures.pop(key, None)
+                    if future is None or future.done():
+                        continue
+                    if error:
+                        future.set_exception(RuntimeError(f"Whisper worker error:\n{error}"))
+                    else:
+                        future.set_result(output)
+
+    def _reap(self):
+        # Fail whatever a crashed worker was holding and start a replacement
+        with self._lock:
+            if self._stopping:
+                return
+            now = time.monotonic()
+            for pid, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+                del self._processes[pid]
+                if pid in self._ready:
+                    self._ready.discard(pid)
+                else:
+                    self._start_failures += 1
+                    self._respawn_at = now + min(2 ** (self._start_failures - 1), RESPAWN_BACKOFF_MAX)
+                    logging.error(f"Whisper worker {pid} exited with code {process.exitcode} while loading "
+                                  f"'{self.model_name}' ({self._start_failures} in a row)")
+                self._fail(self._running_on.pop(pid, ()),
+                           RuntimeError(f"Whisper worker {pid} exited with code {process.exitcode}"))
+
+            if self._start_failures >= self.start_retries and not self._ready:
+                if self._error is None:
+                    self._error = (f"Whisper workers could not load model '{self.model_name}' "
+                                   f"({self._start_failures} attempts); see the log for details")
+                    logging.error(self._error)
+                # Nothing is going to pick these up
+                self._fail(list(self._futures), WhisperUnavailable(self._error))
+                if not self._processes:
+                    return
+            while len(self._processes) < self.workers and now >= self._respawn_at:
+                self._spawn()
+
+    def _fail(self, job_ids, error):
+        # Called with the lock held
+        for job_id in job_ids:
+            future = self._futures.pop(job_id, None)
+            if future and not future.done():
+                future.set_exception(error)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_server():
+    """Process-wide Whisper pool, started on first use."""
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = WhisperServer()
+                _server.start()
+                gauge("whisper_pending_jobs", "Clips queued or running on the Whisper pool").set_function(
+                    lambda: _server.stats()["pending_jobs"])
+                gauge("whisper_ready_workers", "Whisper processes with the model loaded").set_function(
+                    lambda: _server.stats()["ready_workers"])
+    return _server
+
+def warm_up(timeout=300):
+    """Start the pool and block until every worker has its model loaded."""
+    server = get_server()
+    deadline = time.monotonic() + timeout
+    while server.stats()["ready_workers"] < server.workers and time.monotonic() < deadline:
+        if server.stats()["error"]:
+            raise WhisperUnavailable(server.stats()["error"])
+        time.sleep(0.1)
+    return server